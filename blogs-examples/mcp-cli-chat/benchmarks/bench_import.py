@@ -0,0 +1,73 @@
+"""Import-time benchmark for the CLI's cold start.
+
+Runs ``python -X importtime -c "import main"`` in fresh interpreters and
+reports the median total, the slowest modules, and whether any module that
+should only load with the agent was imported at startup. Exits non-zero
+when the budget is exceeded, so it can guard startup time in CI:
+
+    python -m benchmarks.bench_import --max-ms 1500
+"""
+
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+
+# Loaded in the background by Chat.initialize_agent, never at startup
+DEFERRED = ("langgraph", "langchain_google_genai", "langchain_mcp_adapters")
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure(module: str) -> dict[str, tuple[int, int]]:
+    """(self, cumulative) import time in microseconds per module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            times[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, help="fail if the median total exceeds this")
+    args = parser.parse_args()
+
+    # The first run warms the bytecode cache and is not counted
+    measure(args.module)
+    runs = [measure(args.module) for _ in range(args.runs)]
+    totals = [times[args.module][1] / 1000 for times in runs]
+    total = statistics.median(totals)
+
+    last = runs[-1]
+    print(f"import {args.module}: median {total:.0f} ms over {args.runs} runs")
+    print(f"\n{'self ms':>8} {'cum ms':>8}  module")
+    for name, (own, cumulative) in sorted(
+        last.items(), key=lambda item: item[1][1], reverse=True
+    )[: args.top]:
+        print(f"{own / 1000:>8.1f} {cumulative / 1000:>8.1f}  {name}")
+
+    failed = False
+    eager = sorted({name for name in last if name.split(".")[0] in DEFERRED})
+    if eager:
+        print(f"\nImported at startup but should be deferred: {', '.join(eager[:5])}")
+        failed = True
+    if args.max_ms is not None and total > args.max_ms:
+        print(f"\nOver budget: {total:.0f} ms > {args.max_ms:.0f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Per-token overhead of consuming the agent's output stream.
+
+Streams a long scripted answer through the same ReAct agent twice: once
+with astream_events(version="v1"), as Chat.run used to, and once through
+Chat.run's stream_mode="messages"/"updates" path. No MCP server or
+network is involved, so the difference is the streaming overhead alone:
+
+    python -m benchmarks.bench_stream --tokens 2000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+
+from langchain_core.messages import HumanMessage
+
+from benchmarks.fake_llm import ScriptedChatModel
+from core.chat import Chat
+
+
+async def consume_events_v1(chat: Chat, query: str):
+    async for event in chat.agent.astream_events(
+        {"messages": [HumanMessage(content=query)]}, version="v1"
+    ):
+        pass
+
+
+async def consume_lean(chat: Chat, query: str):
+    chat.messages = []
+    async for event in chat.run(query):
+        pass
+
+
+async def measure(consume, chat: Chat, tokens: int, runs: int) -> dict:
+    await consume(chat, "warm up")
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await consume(chat, "hello")
+        durations.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    await consume(chat, "hello")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    duration = statistics.median(durations)
+    return {
+        "turn_ms": duration * 1000,
+        "us_per_token": duration / tokens * 1_000_000,
+        "peak_kb": peak / 1024,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    chunk_size = 4
+    model = ScriptedChatModel(answer="word " * (args.tokens * chunk_size // 5), chunk_size=chunk_size)
+    chat = Chat(clients={}, llm=model)
+    await chat.warm_up()
+
+    results = {
+        "astream_events v1": await measure(consume_events_v1, chat, args.tokens, args.runs),
+        "Chat.run": await measure(consume_lean, chat, args.tokens, args.runs),
+    }
+
+    print(f"{'path':<18} {'turn ms':>9} {'us/token':>9} {'peak KB':>9}")
+    for name, r in results.items():
+        print(f"{name:<18} {r['turn_ms']:>9.1f} {r['us_per_token']:>9.1f} {r['peak_kb']:>9.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,206 @@
+"""Offline per-turn benchmark of the chat client hot paths.
+
+Drives CliChat (mention resolution, context building, history compaction and
+Chat.run's agent loop) against mcp_server.py over stdio, with
+ScriptedChatModel standing in for Gemini, so it needs neither network
+access nor an API key. Run from the project root:
+
+    python -m benchmarks.bench_turns --docs 10,1000,100000 --turns 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+from mcp import types
+
+from benchmarks.corpus import build_corpus
+from benchmarks.fake_llm import ScriptedChatModel
+from core.cli_chat import CliChat
+from mcp_client import MCPClient
+
+
+def _wire_size(message) -> int:
+    # Same serialization the stdio transport writes, plus its newline
+    return len(message.message.model_dump_json(by_alias=True, exclude_none=True)) + 1
+
+
+class _CountingSendStream:
+    def __init__(self, stream, client: "CountingMCPClient"):
+        self._stream = stream
+        self._client = client
+
+    async def send(self, message):
+        self._client.bytes_sent += _wire_size(message)
+        if isinstance(message.message.root, types.JSONRPCRequest):
+            self._client.requests += 1
+        await self._stream.send(message)
+
+    async def __aenter__(self):
+        await self._stream.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return await self._stream.__aexit__(*exc_info)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class _CountingReceiveStream:
+    def __init__(self, stream, client: "CountingMCPClient"):
+        self._stream = stream
+        self._client = client
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self._stream.__anext__()
+        if not isinstance(message, Exception):
+            self._client.bytes_received += _wire_size(message)
+        return message
+
+    async def __aenter__(self):
+        await self._stream.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return await self._stream.__aexit__(*exc_info)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class CountingMCPClient(MCPClient):
+    """MCPClient that counts requests and JSON-RPC bytes in both directions."""
+
+    requests = 0
+    bytes_sent = 0
+    bytes_received = 0
+
+    async def _open_transport(self):
+        read, write = await super()._open_transport()
+        return _CountingReceiveStream(read, self), _CountingSendStream(write, self)
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _maxrss_mb(who: int) -> float:
+    rss = resource.getrusage(who).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+async def bench_corpus(doc_count: int, turns: int, warmup: int, workdir: str) -> dict:
+    db_path = os.path.join(workdir, f"docs-{doc_count}.db")
+    if not os.path.exists(db_path):
+        build_corpus(db_path, doc_count)
+
+    env = {**os.environ, "DOC_STORE": f"sqlite:///{db_path}"}
+    client = CountingMCPClient(
+        command=sys.executable,
+        args=["mcp_server.py"],
+        env=env,
+        resource_cache_bytes=8 * 1024 * 1024,
+    )
+    rng = random.Random(doc_count)
+    model = ScriptedChatModel()
+
+    started = time.perf_counter()
+    async with client:
+        startup = time.perf_counter() - started
+        chat = CliChat(doc_client=client, clients={"doc_client": client}, llm=model)
+
+        latencies: list[float] = []
+        requests: list[int] = []
+        sent: list[int] = []
+        received: list[int] = []
+        for turn in range(warmup + turns):
+            mentioned = [f"doc{rng.randrange(doc_count)}.md" for _ in range(3)]
+            query = "Compare " + " and ".join(f"@{doc_id}" for doc_id in mentioned)
+            # Every other turn the model reads one more document through a tool
+            model.tool_calls = (
+                [{"name": "read_doc_contents", "args": {"doc_id": mentioned[0]}}]
+                if turn % 2
+                else []
+            )
+
+            before = (client.requests, client.bytes_sent, client.bytes_received)
+            turn_started = time.perf_counter()
+            async for _ in chat.run(query):
+                pass
+            elapsed = time.perf_counter() - turn_started
+
+            if turn >= warmup:
+                latencies.append(elapsed)
+                requests.append(client.requests - before[0])
+                sent.append(client.bytes_sent - before[1])
+                received.append(client.bytes_received - before[2])
+
+    return {
+        "docs": doc_count,
+        "turns": turns,
+        "startup_ms": startup * 1000,
+        "p50_ms": _percentile(latencies, 0.5) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "round_trips_per_turn": statistics.mean(requests),
+        "bytes_sent_per_turn": statistics.mean(sent),
+        "bytes_received_per_turn": statistics.mean(received),
+        "client_peak_rss_mb": _maxrss_mb(resource.RUSAGE_SELF),
+        # Largest terminated child so far; corpora run smallest first
+        "server_peak_rss_mb": _maxrss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+def print_table(results: list[dict]):
+    header = (
+        f"{'docs':>8} {'p50 ms':>8} {'p99 ms':>8} {'rt/turn':>8} "
+        f"{'KB out':>8} {'KB in':>8} {'start ms':>9} {'cli MB':>7} {'srv MB':>7}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['docs']:>8} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+            f"{r['round_trips_per_turn']:>8.2f} {r['bytes_sent_per_turn'] / 1024:>8.1f} "
+            f"{r['bytes_received_per_turn'] / 1024:>8.1f} {r['startup_ms']:>9.0f} "
+            f"{r['client_peak_rss_mb']:>7.0f} {r['server_peak_rss_mb']:>7.0f}"
+        )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", default="10,1000,10000", help="comma-separated corpus sizes")
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--workdir", help="where to keep generated corpora (default: temp dir)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    sizes = sorted(int(size) for size in args.docs.split(","))
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = args.workdir or tmp
+        results = [
+            await bench_corpus(size, args.turns, args.warmup, workdir) for size in sizes
+        ]
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,33 @@
+import random
+from typing import Iterator
+
+from doc_store import SQLiteDocumentStore
+
+WORDS = (
+    "budget tower condenser report plan testimony schedule pressure valve "
+    "contract revenue forecast outage inspection pump cooling steel crew "
+    "permit audit risk margin cost delay load sensor capacity"
+).split()
+
+
+def synthetic_docs(count: int, words_per_doc: int = 150, seed: int = 0) -> Iterator[tuple[str, str]]:
+    rng = random.Random(seed)
+    for i in range(count):
+        paragraphs = []
+        for _ in range(3):
+            paragraphs.append(" ".join(rng.choices(WORDS, k=words_per_doc // 3)) + ".")
+        yield f"doc{i}.md", "\n\n".join(paragraphs)
+
+
+def build_corpus(path: str, count: int, batch_size: int = 5000) -> None:
+    """Write ``count`` deterministic documents into a SQLite store at ``path``."""
+    store = SQLiteDocumentStore(path)
+    batch = []
+    for item in synthetic_docs(count):
+        batch.append(item)
+        if len(batch) == batch_size:
+            store.put_many(batch)
+            batch = []
+    if batch:
+        store.put_many(batch)
+    store.close()
@@ -0,0 +1,79 @@
+import json
+from typing import Any, AsyncIterator, Iterator
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import Field
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Deterministic stand-in for ChatGoogleGenerativeAI.
+
+    On a new user turn it requests ``tool_calls`` (if any); once tool results
+    are in the history, or when there are no tool calls, it streams
+    ``answer`` in ``chunk_size``-character chunks.
+    """
+
+    answer: str = "This is a scripted answer. " * 20
+    chunk_size: int = 8
+    tool_calls: list[dict[str, Any]] = Field(default_factory=list)
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _next_message(self, messages: list[BaseMessage]) -> AIMessage:
+        self.calls += 1
+        if self.tool_calls and not isinstance(messages[-1], ToolMessage):
+            return AIMessage(
+                content="",
+                tool_calls=[
+                    {"name": call["name"], "args": call["args"], "id": f"call_{self.calls}_{i}"}
+                    for i, call in enumerate(self.tool_calls)
+                ],
+            )
+        return AIMessage(content=self.answer)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self._next_message(messages))])
+
+    def _chunks(self, message: AIMessage) -> Iterator[ChatGenerationChunk]:
+        if message.tool_calls:
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content="",
+                    tool_call_chunks=[
+                        {
+                            "name": call["name"],
+                            "args": json.dumps(call["args"]),
+                            "id": call["id"],
+                            "index": i,
+                        }
+                        for i, call in enumerate(message.tool_calls)
+                    ],
+                )
+            )
+            return
+        text = message.content
+        for start in range(0, len(text), self.chunk_size):
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(content=text[start : start + self.chunk_size])
+            )
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        for chunk in self._chunks(self._next_message(messages)):
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self, messages, stop=None, run_manager=None, **kwargs
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        for chunk in self._chunks(self._next_message(messages)):
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
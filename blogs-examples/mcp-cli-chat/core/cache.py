@@ -0,0 +1,85 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUCache:
+    """Least-recently-used cache bounded by the total size of its entries.
+
+    Each entry carries the size it was stored with (usually bytes of the
+    encoded payload); the oldest entries are evicted until the total fits
+    into ``max_size`` again. With ``ttl`` set, entries older than that many
+    seconds are treated as missing. ``generation`` goes up on every clear()
+    and invalidate(), so a value computed before one can be recognised and
+    dropped.
+    """
+
+    def __init__(self, max_size: int, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._entries: OrderedDict[Hashable, tuple[Any, int, float]] = OrderedDict()
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and not self._expired(entry)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _expired(self, entry: tuple[Any, int, float]) -> bool:
+        return self.ttl is not None and time.monotonic() - entry[2] > self.ttl
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None and self._expired(entry):
+            self.pop(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(
+        self, key: Hashable, value: Any, size: int, generation: Optional[int] = None
+    ) -> None:
+        """Store ``value``; skipped if the cache was cleared since ``generation``."""
+        if generation is not None and generation != self.generation:
+            return
+        self.pop(key)
+        if size > self.max_size:
+            return
+        self._entries[key] = (value, size, time.monotonic())
+        self.size += size
+        while self.size > self.max_size:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self.size -= evicted_size
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self.size -= entry[1]
+        return entry[0]
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop ``key`` because its value changed; puts from older
+        generations are skipped, as they may hold the old value."""
+        self.generation += 1
+        self.pop(key)
+
+    def invalidate_values(self, stale: Callable[[Any], bool]) -> None:
+        """invalidate() every entry whose value ``stale`` returns True for."""
+        self.generation += 1
+        for key in [key for key, entry in self._entries.items() if stale(entry[0])]:
+            self.pop(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+        self.generation += 1
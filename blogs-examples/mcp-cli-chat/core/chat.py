@@ -1,25 +1,119 @@
+import asyncio
 import os
-from langchain_core.messages import BaseMessage, HumanMessage
-from langgraph.prebuilt import create_react_agent
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_mcp_adapters.tools import load_mcp_tools
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Literal, Optional
+from langchain_core.messages import AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
 
+from core.history import HistoryManager, extractive_summary
+from core.tracing import Span, tracer
 from mcp_client import MCPClient
 
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+
+
+@dataclass(slots=True)
+class AgentEvent:
+    """What Chat.run yields: a "token" of the answer (``data`` is the text),
+    a "tool_start" (``data`` is the arguments), a "tool_end" (``data`` is
+    the result) or the "final" AIMessage, already added to the history."""
+
+    kind: Literal["token", "tool_start", "tool_end", "final"]
+    name: str = ""
+    data: Any = None
+
+
+def _load_agent_stack():
+    # LangGraph, the Gemini client and the MCP adapters take seconds to
+    # import, so they are loaded off the event loop when the agent is built
+    from langgraph.prebuilt import create_react_agent
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    from langchain_mcp_adapters.tools import convert_mcp_tool_to_langchain_tool
+
+    return create_react_agent, ChatGoogleGenerativeAI, convert_mcp_tool_to_langchain_tool
+
 
 class Chat:
-    def __init__(self, clients: dict[str, MCPClient]):
+    def __init__(
+        self,
+        clients: dict[str, MCPClient],
+        llm: Optional["BaseChatModel"] = None,
+    ):
         self.clients: dict[str, MCPClient] = clients
         self.messages: list[BaseMessage] = []
+        self.history = HistoryManager(
+            window_turns=int(os.getenv("HISTORY_WINDOW_TURNS", "10")),
+            summarizer=(
+                self._summarize_with_llm
+                if os.getenv("HISTORY_SUMMARIZER", "extractive") == "llm"
+                else None
+            ),
+        )
         self.agent = None
+        self._agent_task: Optional[asyncio.Task] = None
+        # Defaults to Gemini, built in initialize_agent; benchmarks pass a fake model
+        self.llm = llm
+        self._tool_index: Optional[dict[str, MCPClient]] = None
 
-    async def initialize_agent(self):
-        tools = []
         for client in self.clients.values():
-            tools.extend(await load_mcp_tools(client.session()))
-        gemini_model = os.getenv("GEMINI_MODEL", "gemini-2.5-pro")
-        llm = ChatGoogleGenerativeAI(model=gemini_model)
-        self.agent = create_react_agent(llm, tools)
+            client.add_list_changed_listener(self._on_list_changed)
+
+    def _on_list_changed(self, kind: str):
+        if kind == "tools":
+            self._tool_index = None
+            self.agent = None
+            self._agent_task = None
+
+    async def find_tool_client(self, tool_name: str) -> Optional[MCPClient]:
+        if self._tool_index is None:
+            index = {}
+            for client in self.clients.values():
+                for tool in await client.list_tools():
+                    index.setdefault(tool.name, client)
+            self._tool_index = index
+        return self._tool_index.get(tool_name)
+
+    async def initialize_agent(self):
+        catalog = [
+            (client, tool)
+            for client in self.clients.values()
+            # Reuse the client's cached catalog instead of re-listing per session
+            for tool in await client.list_tools()
+        ]
+        self.agent = await asyncio.to_thread(self._build_agent, catalog)
+
+    def _build_agent(self, catalog):
+        create_react_agent, ChatGoogleGenerativeAI, convert_tool = _load_agent_stack()
+        # The client stands in for the session so tool calls are traced
+        tools = [convert_tool(client, tool) for client, tool in catalog]
+        if self.llm is None:
+            gemini_model = os.getenv("GEMINI_MODEL", "gemini-2.5-pro")
+            self.llm = ChatGoogleGenerativeAI(model=gemini_model)
+        return create_react_agent(self.llm, tools)
+
+    def warm_up(self) -> asyncio.Task:
+        """Start building the agent in the background, e.g. while the user
+        types the first message; run() waits for it."""
+        if self._agent_task is None or (self._agent_task.done() and not self.agent):
+            # A failed attempt is retried on the next call
+            self._agent_task = asyncio.create_task(self.initialize_agent())
+        return self._agent_task
+
+    async def _summarize_with_llm(self, previous: str, messages: list[BaseMessage]) -> str:
+        transcript = await extractive_summary(previous, messages)
+        response = await self.llm.ainvoke(
+            [
+                HumanMessage(
+                    content=(
+                        "Condense this conversation log into a short summary that keeps "
+                        "facts, decisions and document names the assistant may need "
+                        f"later. Reply with the summary only.\n\n{transcript}"
+                    )
+                )
+            ]
+        )
+        return response.content if isinstance(response.content, str) else transcript
 
     async def _process_query(self, query: str):
         self.messages.append(HumanMessage(content=query))
@@ -29,11 +123,53 @@ class Chat:
         query: str,
     ):
         if not self.agent:
-            await self.initialize_agent()
+            await self.warm_up()
 
         await self._process_query(query)
+        self.messages = await self.history.compact(self.messages)
 
-        async for event in self.agent.astream_events(
-            {"messages": self.messages}, version="v1"
+        # stream_mode="messages" yields model tokens and tool results as they
+        # arrive and "updates" each finished model step; unlike
+        # astream_events there is no event per chain step and no JSON patch
+        # of the run state per token
+        model_span = self._start_span("agent.model", self.llm.get_name())
+        tool_spans: dict[str, tuple[Span, float]] = {}
+        async for mode, payload in self.agent.astream(
+            {"messages": self.messages}, stream_mode=["messages", "updates"]
         ):
-            yield event
\ No newline at end of file
+            if mode == "messages":
+                message = payload[0]
+                if isinstance(message, AIMessageChunk):
+                    text = message.text()
+                    if text:
+                        span, started = model_span
+                        if "first_token_ms" not in span.attributes:
+                            span.attributes["first_token_ms"] = round(
+                                (time.perf_counter() - started) * 1000, 3
+                            )
+                        yield AgentEvent("token", data=text)
+                elif isinstance(message, ToolMessage):
+                    self._end_span(tool_spans.pop(message.tool_call_id, None))
+                    # The next model step starts once the tools are done
+                    model_span = self._start_span("agent.model", self.llm.get_name())
+                    yield AgentEvent("tool_end", message.name or "", message.content)
+            elif "agent" in payload:
+                self._end_span(model_span)
+                message = payload["agent"]["messages"][-1]
+                for call in message.tool_calls:
+                    tool_spans[call["id"]] = self._start_span("agent.tool", call["name"])
+                    yield AgentEvent("tool_start", call["name"], call["args"])
+                if not message.tool_calls:
+                    self.messages.append(message)
+                    yield AgentEvent("final", data=message)
+
+    @staticmethod
+    def _start_span(method: str, target: str) -> tuple[Span, float]:
+        return Span(method=method, target=target, start_ns=time.time_ns()), time.perf_counter()
+
+    @staticmethod
+    def _end_span(step: Optional[tuple[Span, float]]):
+        if step:
+            span, started = step
+            span.duration_ms = (time.perf_counter() - started) * 1000
+            tracer.record(span)
@@ -1,4 +1,5 @@
-from typing import List, Optional
+import asyncio
+from typing import Callable, List, Optional
 from prompt_toolkit import PromptSession
 from prompt_toolkit.completion import Completer, Completion
 from prompt_toolkit.key_binding import KeyBindings
@@ -9,17 +10,17 @@ from prompt_toolkit.document import Document
 from prompt_toolkit.buffer import Buffer
 from prompt_toolkit.patch_stdout import patch_stdout
 from rich.console import Console
-from rich.markdown import Markdown
+from rich.table import Table
 from prompt_toolkit.validation import Validator, ValidationError
 
 from core.cli_chat import CliChat
+from core.completion import CompletionIndex
+from core.markdown_stream import MarkdownStream
+from core.tracing import tracer
 
 
 class CommandValidator(Validator):
-    def __init__(self, resources: list[str]):
-        self.resources = resources
-
-    def update_resources(self, resources: list[str]):
+    def __init__(self, resources: CompletionIndex):
         self.resources = resources
 
     def validate(self, document):
@@ -38,7 +39,8 @@ class CommandValidator(Validator):
                 )
 
             doc_id = words[1]
-            if doc_id not in self.resources:
+            # With a partial index the server checks the id instead
+            if self.resources.complete and doc_id not in self.resources:
                 raise ValidationError(
                     message=f"Error: Document '{doc_id}' not found",
                     cursor_position=len(text),
@@ -73,18 +75,26 @@ class CommandAutoSuggest(AutoSuggest):
 
 
 class UnifiedCompleter(Completer):
-    def __init__(self):
+    def __init__(
+        self,
+        resources: CompletionIndex,
+        on_partial: Optional[Callable[[str], None]] = None,
+    ):
         self.prompts = []
         self.prompt_dict = {}
-        self.resources = []
+        self.resources = resources
+        # Called with the prefix being completed while the index is partial
+        self.on_partial = on_partial
+
+    def search(self, prefix: str) -> list[str]:
+        if not self.resources.complete and self.on_partial is not None:
+            self.on_partial(prefix)
+        return self.resources.search(prefix)
 
     def update_prompts(self, prompts: List):
         self.prompts = prompts
         self.prompt_dict = {prompt.name: prompt for prompt in prompts}
 
-    def update_resources(self, resources: List):
-        self.resources = resources
-
     def get_completions(self, document, complete_event):
         text = document.text
         text_before_cursor = document.text_before_cursor
@@ -93,14 +103,13 @@ class UnifiedCompleter(Completer):
             last_at_pos = text_before_cursor.rfind("@")
             prefix = text_before_cursor[last_at_pos + 1 :]
 
-            for resource_id in self.resources:
-                if resource_id.lower().startswith(prefix.lower()):
-                    yield Completion(
-                        resource_id,
-                        start_position=-len(prefix),
-                        display=resource_id,
-                        display_meta="Resource",
-                    )
+            for resource_id in self.search(prefix):
+                yield Completion(
+                    resource_id,
+                    start_position=-len(prefix),
+                    display=resource_id,
+                    display_meta="Resource",
+                )
             return
 
         if text.startswith("/"):
@@ -123,7 +132,7 @@ class UnifiedCompleter(Completer):
                 cmd = parts[0]
 
                 if cmd in self.prompt_dict:
-                    for id in self.resources:
+                    for id in self.search(""):
                         yield Completion(
                             id,
                             start_position=0,
@@ -134,26 +143,36 @@ class UnifiedCompleter(Completer):
             if len(parts) >= 2:
                 doc_prefix = parts[-1]
 
-                for resource in self.resources:
-                    if "id" in resource and resource["id"].lower().startswith(
-                        doc_prefix.lower()
-                    ):
-                        yield Completion(
-                            resource["id"],
-                            start_position=-len(doc_prefix),
-                            display=resource["id"],
-                        )
+                for resource_id in self.search(doc_prefix):
+                    yield Completion(
+                        resource_id,
+                        start_position=-len(doc_prefix),
+                        display=resource_id,
+                    )
                 return
 
 
 class CliApp:
+    # Ids loaded up front; beyond this, completion fetches ids by prefix
+    PRELOAD_IDS = 5000
+    PREFIX_FETCH_IDS = 200
+
     def __init__(self, agent: CliChat):
         self.agent = agent
         self.resources = []
+        self._fetched_prefixes: set[str] = set()
         self.prompts = []
         self.console = Console()
+        self.agent_error: Optional[str] = None
 
-        self.completer = UnifiedCompleter()
+        # Shared by completion and validation; updated in place on refresh
+        self.doc_index = CompletionIndex()
+        self.completer = UnifiedCompleter(self.doc_index, self._on_partial_completion)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Doc server notifications, applied in the background by
+        # _sync_in_background: ResourceChanges, None or "prompts"
+        self._pending: asyncio.Queue = asyncio.Queue()
+        self._sync_task: Optional[asyncio.Task] = None
 
         self.command_autosuggester = CommandAutoSuggest([])
 
@@ -215,7 +234,7 @@ class CliApp:
                 buffer.validate_and_handle()
 
         self.history = InMemoryHistory()
-        self.validator = CommandValidator(self.resources)
+        self.validator = CommandValidator(self.doc_index)
         self.session = PromptSession(
             completer=self.completer,
             history=self.history,
@@ -226,8 +245,10 @@ class CliApp:
                     "completion-menu.completion": "bg:#222222 #ffffff",
                     "completion-menu.completion.current": "bg:#444444 #ffffff",
                     "validation-toolbar": "bg:#aa0000 #ffffff bold",
+                    "bottom-toolbar": "#aaaaaa bg:#222222",
                 }
             ),
+            bottom_toolbar=self.agent_status,
             complete_while_typing=True,
             complete_in_thread=True,
             auto_suggest=self.command_autosuggester,
@@ -248,17 +269,101 @@ class CliApp:
 
     async def initialize(self):
         self.print_welcome_message()
-        await self.refresh_resources()
-        await self.refresh_prompts()
+        # Build the agent while the listings load and the user types the
+        # first message, so the first query doesn't pay for it
+        self.agent.warm_up().add_done_callback(self._on_agent_ready)
+        # Subscribe before listing so nothing changed in between is missed
+        doc_client = self.agent.doc_client
+        doc_client.add_resource_listener(self._pending.put_nowait)
+        doc_client.add_list_changed_listener(self._on_list_changed)
+        await asyncio.gather(self.refresh_resources(), self.refresh_prompts())
+        self._sync_task = asyncio.create_task(self._sync_in_background())
+
+    def _on_list_changed(self, kind: str):
+        # Resource list changes also arrive, with details, as ResourceChanges
+        if kind == "prompts":
+            self._pending.put_nowait("prompts")
+
+    async def _sync_in_background(self):
+        """Keeps completion and validation current as the server reports
+        changes, patching the doc index rather than relisting it."""
+        while True:
+            pending = [await self._pending.get()]
+            while not self._pending.empty():
+                pending.append(self._pending.get_nowait())
+
+            if "prompts" in pending:
+                await self.refresh_prompts()
+            changes = [item for item in pending if item != "prompts"]
+            if None in changes:
+                # The server didn't say which documents changed
+                await self.refresh_resources()
+                continue
+            for change in changes:
+                # Content updates don't affect completion
+                self.doc_index.remove(self.agent.doc_ids(change.removed))
+                self.doc_index.add(self.agent.doc_ids(change.added))
+
+    def _on_agent_ready(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            self.agent_error = str(task.exception())
+        self.session.app.invalidate()
+
+    def agent_status(self) -> str:
+        if self.agent.agent is not None:
+            return " Agent ready"
+        if self.agent_error:
+            return f" Agent failed to load ({self.agent_error}); retrying on your first message"
+        return " Loading agent..."
 
     async def refresh_resources(self):
+        self._loop = asyncio.get_running_loop()
         try:
-            self.resources = await self.agent.list_docs_ids()
-            self.completer.update_resources(self.resources)
-            self.validator.update_resources(self.resources)
+            ids: list[str] = []
+            complete = True
+            async for page in self.agent.iter_doc_ids():
+                # Completion can use each page as soon as it arrives
+                self.doc_index.add(page)
+                ids.extend(page)
+                if len(ids) >= self.PRELOAD_IDS:
+                    complete = False
+                    break
+            self.resources = ids
+            self.doc_index.complete = complete
+            self._fetched_prefixes.clear()
+            if complete:
+                self.doc_index.update(ids)
         except Exception as e:
             print(f"Error refreshing resources: {e}")
 
+    def _on_partial_completion(self, prefix: str):
+        # Runs in the completion thread; fetch on the event loop
+        if self._loop is None or prefix in self._fetched_prefixes:
+            return
+        self._fetched_prefixes.add(prefix)
+        self._loop.call_soon_threadsafe(
+            lambda: asyncio.ensure_future(self._fetch_prefix(prefix))
+        )
+
+    async def _fetch_prefix(self, prefix: str):
+        try:
+            page = await anext(
+                self.agent.iter_doc_ids(prefix, page_size=self.PREFIX_FETCH_IDS)
+            )
+        except Exception as e:
+            self._fetched_prefixes.discard(prefix)
+            print(f"Error fetching documents for '{prefix}': {e}")
+            return
+        # The page is the server's answer for every id up to its last one,
+        # or under the whole prefix if it wasn't full; ids missing from it
+        # were deleted since they were loaded
+        last = page[-1] if len(page) >= self.PREFIX_FETCH_IDS else None
+        if self.doc_index.replace_prefix(prefix, page, last):
+            # Show the fetched ids in the menu that is already open
+            buffer = self.session.app.current_buffer
+            if buffer.complete_state is not None:
+                buffer.start_completion(select_first=False)
+
     async def refresh_prompts(self):
         try:
             self.prompts = await self.agent.list_prompts()
@@ -268,6 +373,34 @@ class CliApp:
         except Exception as e:
             print(f"Error refreshing prompts: {e}")
 
+    def print_stats(self):
+        context = self.agent.last_context_stats
+        if context.original_tokens:
+            self.console.print(
+                f"Last document context: ~{context.used_tokens} of "
+                f"~{context.original_tokens} tokens ({context.saved_tokens} saved)"
+            )
+        rows = tracer.stats()
+        if not rows:
+            self.console.print("[bold yellow]No requests recorded yet.[/bold yellow]")
+            return
+        table = Table(title="Request latency (ms)")
+        for column in ("server", "method", "target"):
+            table.add_column(column)
+        for column in ("count", "p50", "p95", "p99"):
+            table.add_column(column, justify="right")
+        for row in rows:
+            table.add_row(
+                row["server"] or "",
+                row["method"],
+                row["target"] or "",
+                str(row["count"]),
+                f"{row['p50_ms']:.1f}",
+                f"{row['p95_ms']:.1f}",
+                f"{row['p99_ms']:.1f}",
+            )
+        self.console.print(table)
+
     async def _process_client_command(self, user_input: str) -> bool:
         """Process client-side commands that don't need the agent."""
         words = user_input.strip().split()
@@ -280,11 +413,16 @@ class CliApp:
             help_text += "- /help: Show this help message.\n"
             help_text += "- /clear: Clear the conversation history.\n"
             help_text += "- /call <tool> [args]: Call a tool directly.\n"
+            help_text += "- /stats: Show request latency percentiles and context size.\n"
             for p in self.prompts:
                 help_text += f"- /{p.name} <doc_id>: {p.description}\n"
             self.console.print(help_text)
             return True
 
+        if command == "/stats":
+            self.print_stats()
+            return True
+
         if command == "/clear":
             self.agent.messages = []
             self.console.print("[bold yellow]Conversation history cleared.[/bold yellow]")
@@ -303,25 +441,16 @@ class CliApp:
                 if await self._process_client_command(user_input):
                     continue
 
-                final_response = ""
                 self.console.print("[bold green]Thinking...[/bold green]")
-                async for event in self.agent.run(user_input):
-                    kind = event["event"]
-                    if kind == "on_tool_start":
-                        self.console.print(f"\n[bold blue]Calling tool: {event['name']}[/bold blue]")
-                        self.console.print(f"Tool input: {event['data'].get('input')}")
-                    elif kind == "on_tool_end":
-                        self.console.print(f"[bold blue]Tool output:[/bold blue] {event['data'].get('output')}")
-                    elif kind == "on_chat_model_stream":
-                        chunk = event["data"]["chunk"]
-                        if chunk.content:
-                            final_response += chunk.content
-                    elif kind == "on_chain_end" and event["name"] == "__main__":
-                        last_message = event["data"]["output"]["messages"][-1]
-                        if last_message.content:
-                            self.agent.messages.append(last_message)
-
-                self.console.print(Markdown(final_response))
+                with MarkdownStream(self.console) as response:
+                    async for event in self.agent.run(user_input):
+                        if event.kind == "token":
+                            response.feed(event.data)
+                        elif event.kind == "tool_start":
+                            self.console.print(f"\n[bold blue]Calling tool: {event.name}[/bold blue]")
+                            self.console.print(f"Tool input: {event.data}")
+                        elif event.kind == "tool_end":
+                            self.console.print(f"[bold blue]Tool output:[/bold blue] {event.data}")
 
             except KeyboardInterrupt:
                 break
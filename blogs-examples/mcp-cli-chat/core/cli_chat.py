@@ -1,11 +1,23 @@
+import asyncio
 import json
-from typing import List, Tuple
+import re
+from typing import TYPE_CHECKING, AsyncIterator, List, Optional
+from urllib.parse import quote, urlencode
 from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
 from mcp.types import Prompt, PromptMessage
 
 from core.chat import Chat
+from core.context import ContextBuilder, ContextStats, MentionedDocument
 from mcp_client import MCPClient
 
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+
+DOC_URI_PREFIX = "docs://documents/"
+
+# "@doc_id:10-20" (or "@doc_id:10") mentions only lines 10 to 20 of a document
+MENTION_RANGE = re.compile(r"^(?P<doc_id>.+):(?P<start>\d+)(?:-(?P<end>\d+))?$")
+
 
 async def print_progress_callback(
     progress: float, total: float | None, message: str | None
@@ -22,20 +34,133 @@ class CliChat(Chat):
         self,
         doc_client: MCPClient,
         clients: dict[str, MCPClient],
+        fetch_concurrency: int = 8,
+        context_token_budget: int = 8000,
+        llm: Optional["BaseChatModel"] = None,
     ):
-        super().__init__(clients=clients)
+        super().__init__(clients=clients, llm=llm)
 
         self.doc_client: MCPClient = doc_client
+        self.fetch_concurrency = fetch_concurrency
+        self.context_builder = ContextBuilder(context_token_budget)
+        self.last_context_stats = ContextStats()
 
     async def list_prompts(self) -> list[Prompt]:
         return await self.doc_client.list_prompts()
 
-    async def list_docs_ids(self) -> list[str]:
-        return await self.doc_client.read_resource("docs://documents")
+    async def iter_doc_ids(
+        self, prefix: str = "", glob: Optional[str] = None, page_size: int = 1000
+    ) -> AsyncIterator[list[str]]:
+        """Doc ids in sorted order, one page per round-trip."""
+        cursor = None
+        while True:
+            params = {"limit": page_size, "prefix": prefix}
+            if glob:
+                params["glob"] = glob
+            if cursor:
+                params["cursor"] = cursor
+            page = await self.doc_client.read_resource(
+                f"docs://documents/page/{urlencode(params)}", use_cache=False
+            )
+            yield page["ids"]
+            cursor = page["nextCursor"]
+            if not cursor:
+                return
+
+    async def list_docs_ids(
+        self, prefix: str = "", glob: Optional[str] = None
+    ) -> list[str]:
+        ids = []
+        async for page in self.iter_doc_ids(prefix, glob):
+            ids.extend(page)
+        return ids
+
+    async def doc_exists(self, doc_id: str) -> bool:
+        params = urlencode({"limit": 1, "prefix": doc_id})
+        page = await self.doc_client.read_resource(
+            f"docs://documents/page/{params}", use_cache=False
+        )
+        return page["ids"][:1] == [doc_id]
+
+    @staticmethod
+    def doc_ids(uris: list[str]) -> list[str]:
+        """Doc ids of the ``docs://documents/{doc_id}`` URIs in ``uris``."""
+        return [
+            uri.removeprefix(DOC_URI_PREFIX)
+            for uri in uris
+            if uri.startswith(DOC_URI_PREFIX)
+        ]
 
     async def get_doc_content(self, doc_id: str) -> str:
         return await self.doc_client.read_resource(f"docs://documents/{doc_id}")
 
+    async def get_docs_content(self, doc_ids: list[str]) -> dict[str, str]:
+        cache = self.doc_client.resource_cache
+        contents: dict[str, str] = {}
+        missing: list[str] = []
+        for doc_id in doc_ids:
+            cached = (
+                cache.get(f"docs://documents/{doc_id}") if cache is not None else None
+            )
+            if cached is None:
+                missing.append(doc_id)
+            else:
+                contents[doc_id] = cached
+
+        if len(missing) > 1:
+            try:
+                # One round-trip for every uncached document
+                ids = ",".join(quote(doc_id, safe="") for doc_id in missing)
+                batch = await self.doc_client.read_resource(
+                    f"docs://documents/batch/{ids}", use_cache=False
+                )
+                for doc_id, content in batch.items():
+                    contents[doc_id] = content
+                    if cache is not None:
+                        cache.put(
+                            f"docs://documents/{doc_id}", content, len(content.encode())
+                        )
+                return contents
+            except Exception:
+                # Server without the batch resource, fetch one by one below
+                pass
+
+        fetched = await self._gather_limited(
+            self._get_optional(self.get_doc_content(doc_id)) for doc_id in missing
+        )
+        contents.update(
+            (doc_id, content)
+            for doc_id, content in zip(missing, fetched)
+            if content is not None
+        )
+        return contents
+
+    @staticmethod
+    async def _get_optional(coro):
+        # Unknown documents are left out rather than failing the whole query
+        try:
+            return await coro
+        except Exception:
+            return None
+
+    async def get_doc_lines(self, doc_id: str, first: int, count: int) -> str:
+        # Ranges are served from the server's mmap-backed reads, so only the
+        # slice crosses stdio; they skip the cache since edits only evict the
+        # full-document entry.
+        return await self.doc_client.read_resource(
+            f"docs://documents/{doc_id}?unit=lines&offset={first}&length={count}",
+            use_cache=False,
+        )
+
+    async def _gather_limited(self, coros) -> list:
+        semaphore = asyncio.Semaphore(self.fetch_concurrency)
+
+        async def run(coro):
+            async with semaphore:
+                return await coro
+
+        return await asyncio.gather(*(run(coro) for coro in coros))
+
     async def get_prompt(
         self,
         command: str,
@@ -44,21 +169,53 @@ class CliChat(Chat):
         return await self.doc_client.get_prompt(command, {"doc_id": doc_id})
 
     async def _extract_resources(self, query: str) -> str:
-        mentions = [word[1:] for word in query.split() if word.startswith("@")]
-
-        doc_ids = await self.list_docs_ids()
-        mentioned_docs: list[Tuple[str, str]] = []
-
-        for doc_id in doc_ids:
-            if doc_id in mentions:
-                content = await self.get_doc_content(doc_id)
-                mentioned_docs.append((doc_id, content))
-
-        return "".join(
-            f'\n<document id="{doc_id}">\n{content}\n</document>\n'
-            for doc_id, content in mentioned_docs
+        # dict keeps the mention order while dropping duplicates
+        mentions = dict.fromkeys(
+            word[1:] for word in query.split() if word.startswith("@")
+        )
+        if not mentions:
+            return ""
+
+        # Rather than listing every id to see which mentions are documents,
+        # fetch them all and keep what exists. A mention that is itself a doc
+        # id wins over reading it as a line range.
+        ranges: list[tuple[str, int, int, str]] = []
+        for mention in mentions:
+            match = MENTION_RANGE.match(mention)
+            if match:
+                start = max(int(match["start"]), 1)
+                end = max(int(match["end"] or start), start)
+                ranges.append((match["doc_id"], start, end, mention))
+
+        contents, slices = await asyncio.gather(
+            self.get_docs_content(list(mentions)),
+            self._gather_limited(
+                self._get_optional(
+                    self.get_doc_lines(doc_id, start - 1, end - start + 1)
+                )
+                for doc_id, start, end, _ in ranges
+            ),
         )
 
+        documents = [
+            MentionedDocument(mention, contents[mention])
+            for mention in mentions
+            if mention in contents
+        ] + [
+            MentionedDocument(doc_id, text, lines=f"{start}-{end}")
+            for (doc_id, start, end, mention), text in zip(ranges, slices)
+            if mention not in contents and text is not None
+        ]
+
+        context, stats = self.context_builder.build(query, documents)
+        self.last_context_stats = stats
+        if stats.saved_tokens > 0:
+            print(
+                f"Context trimmed to ~{stats.used_tokens} of ~{stats.original_tokens} "
+                f"tokens ({stats.saved_tokens} saved)"
+            )
+        return context
+
     async def _process_command(self, query: str) -> bool:
         if not query.startswith("/"):
             return False
@@ -80,26 +237,21 @@ class CliChat(Chat):
                     print("Invalid JSON arguments.")
                     return True
 
-            tool_found = False
-            for client in self.clients.values():
-                tools = await client.list_tools()
-                if any(t.name == tool_name for t in tools):
-                    try:
-                        print(f"Calling tool '{tool_name}'...")
-                        result = await client.session().call_tool(
-                            name=tool_name,
-                            arguments=tool_args,
-                            progress_callback=print_progress_callback,
-                        )
-                        print("Tool result:", result.result)
-                        tool_found = True
-                        break
-                    except Exception as e:
-                        print(f"Error calling tool: {e}")
-                        return True
-
-            if not tool_found:
+            client = await self.find_tool_client(tool_name)
+            if client is None:
                 print(f"Tool '{tool_name}' not found.")
+                return True
+
+            try:
+                print(f"Calling tool '{tool_name}'...")
+                result = await client.call_tool(
+                    tool_name,
+                    tool_args,
+                    progress_callback=print_progress_callback,
+                )
+                print("Tool result:", result.content)
+            except Exception as e:
+                print(f"Error calling tool: {e}")
 
             return True
 
@@ -112,8 +264,7 @@ class CliChat(Chat):
         
         # Validate that the document exists
         try:
-            doc_ids = await self.list_docs_ids()
-            if doc_id not in doc_ids:
+            if not await self.doc_exists(doc_id):
                 print(f"Error: Document '{doc_id}' not found.")
                 return True
         except Exception as e:
@@ -0,0 +1,120 @@
+import heapq
+import re
+import threading
+from bisect import bisect_left, insort
+from typing import Iterable, Optional
+
+
+class CompletionIndex:
+    """Doc ids kept sorted by their lowercase form for prefix lookups.
+
+    Prefix matches are found by bisection, in sorted order. Only if there
+    are none, ids containing the query as a subsequence are returned,
+    tightest and earliest match first, from a window of at most
+    ``FUZZY_WINDOW`` ids that starts at the query's first letter. Updates
+    insert and remove only the ids that changed. Completion runs in a worker
+    thread, so every access takes a lock.
+    """
+
+    # Above this many changes a full re-sort is cheaper than inserting one by one
+    REBUILD_THRESHOLD = 256
+    # Ids scanned per keystroke for fuzzy matches
+    FUZZY_WINDOW = 2000
+
+    def __init__(self, ids: Iterable[str] = ()):
+        # False while only part of the server's ids have been loaded
+        self.complete = True
+        self._lock = threading.Lock()
+        self._ids: set[str] = set()
+        self._keys: list[tuple[str, str]] = []
+        self.update(ids)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def update(self, ids: Iterable[str]):
+        """Make the index hold exactly ``ids``."""
+        ids = set(ids)
+        with self._lock:
+            added = ids - self._ids
+            removed = self._ids - ids
+            if len(added) + len(removed) > self.REBUILD_THRESHOLD:
+                self._ids = ids
+                self._keys = sorted((doc_id.lower(), doc_id) for doc_id in ids)
+            else:
+                self._remove(removed)
+                self._add(added)
+
+    def add(self, ids: Iterable[str]):
+        with self._lock:
+            self._add(ids)
+
+    def remove(self, ids: Iterable[str]):
+        with self._lock:
+            self._remove(ids)
+
+    def replace_prefix(
+        self, prefix: str, ids: Iterable[str], last: Optional[str] = None
+    ) -> bool:
+        """Make the ids that start with ``prefix``, and sort no later than
+        ``last`` if given, exactly ``ids``; the prefix is case-sensitive, as
+        on the server. Returns whether anything changed."""
+        ids = set(ids)
+        key = prefix.lower()
+        with self._lock:
+            stale = []
+            for doc_key, doc_id in self._keys[bisect_left(self._keys, (key, "")) :]:
+                if not doc_key.startswith(key):
+                    break
+                if (
+                    doc_id.startswith(prefix)
+                    and (last is None or doc_id <= last)
+                    and doc_id not in ids
+                ):
+                    stale.append(doc_id)
+            added = ids - self._ids
+            self._remove(stale)
+            self._add(added)
+        return bool(stale or added)
+
+    def _add(self, ids: Iterable[str]):
+        for doc_id in ids:
+            if doc_id not in self._ids:
+                self._ids.add(doc_id)
+                insort(self._keys, (doc_id.lower(), doc_id))
+
+    def _remove(self, ids: Iterable[str]):
+        for doc_id in ids:
+            if doc_id in self._ids:
+                self._ids.discard(doc_id)
+                key = (doc_id.lower(), doc_id)
+                del self._keys[bisect_left(self._keys, key)]
+
+    def search(self, query: str, limit: int = 50) -> list[str]:
+        query = query.lower()
+        with self._lock:
+            matches = []
+            start = bisect_left(self._keys, (query, ""))
+            for key, doc_id in self._keys[start : start + limit]:
+                if not key.startswith(query):
+                    break
+                matches.append(doc_id)
+            if matches or len(query) < 2:
+                return matches
+            # Ids sharing the query's first letter are tried first, wrapping
+            # round to the rest while the window lasts
+            start = bisect_left(self._keys, (query[0], ""))
+            window = self._keys[start : start + self.FUZZY_WINDOW]
+            if len(window) < self.FUZZY_WINDOW:
+                window += self._keys[: min(start, self.FUZZY_WINDOW - len(window))]
+
+        pattern = re.compile(".*?".join(map(re.escape, query)))
+        scored = []
+        for key, doc_id in window:
+            match = pattern.search(key)
+            if match:
+                scored.append((match.end() - match.start(), match.start(), key, doc_id))
+        return [doc_id for *_, doc_id in heapq.nsmallest(limit, scored)]
@@ -0,0 +1,115 @@
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+WORD = re.compile(r"\w+")
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token is close enough for English text on Gemini
+    # and avoids pulling a tokenizer into the hot path.
+    return (len(text) + 3) // 4
+
+
+@dataclass
+class MentionedDocument:
+    doc_id: str
+    content: str
+    lines: Optional[str] = None
+
+    def render(self, body: str) -> str:
+        lines = f' lines="{self.lines}"' if self.lines else ""
+        return f'\n<document id="{self.doc_id}"{lines}>\n{body}\n</document>\n'
+
+
+@dataclass
+class ContextStats:
+    original_tokens: int = 0
+    used_tokens: int = 0
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.used_tokens
+
+
+def _chunks(text: str, chunk_chars: int) -> list[str]:
+    """Split on blank lines, merging paragraphs up to ``chunk_chars`` and
+    hard-splitting any paragraph longer than that."""
+    chunks: list[str] = []
+    current = ""
+    for paragraph in PARAGRAPH_BREAK.split(text):
+        while len(paragraph) > chunk_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:chunk_chars])
+            paragraph = paragraph[chunk_chars:]
+        if current and len(current) + len(paragraph) + 2 > chunk_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class ContextBuilder:
+    """Fits mentioned documents into a token budget.
+
+    Documents that fit are included whole. Otherwise each document is cut
+    into paragraph chunks and the chunks sharing the most words with the
+    query are kept, in their original order, until the budget is spent.
+    """
+
+    def __init__(self, budget_tokens: int, chunk_chars: int = 1200):
+        self.budget_tokens = budget_tokens
+        self.chunk_chars = chunk_chars
+
+    def build(
+        self, query: str, documents: list[MentionedDocument]
+    ) -> tuple[str, ContextStats]:
+        full = [doc.render(doc.content) for doc in documents]
+        stats = ContextStats(original_tokens=sum(estimate_tokens(f) for f in full))
+        if stats.original_tokens <= self.budget_tokens:
+            stats.used_tokens = stats.original_tokens
+            return "".join(full), stats
+
+        query_words = {word.lower() for word in WORD.findall(query) if len(word) > 2}
+        candidates = []
+        doc_chunks = []
+        for doc_index, doc in enumerate(documents):
+            chunks = _chunks(doc.content, self.chunk_chars)
+            doc_chunks.append(chunks)
+            for chunk_index, chunk in enumerate(chunks):
+                overlap = len(query_words & {w.lower() for w in WORD.findall(chunk)})
+                # Best overlap first; ties go to earlier chunks, then earlier docs
+                candidates.append((-overlap, chunk_index, doc_index))
+
+        # Every document keeps at least its tag, even if no chunk fits
+        remaining = self.budget_tokens - sum(
+            estimate_tokens(doc.render("")) for doc in documents
+        )
+        selected: list[set[int]] = [set() for _ in documents]
+        for _, chunk_index, doc_index in sorted(candidates):
+            cost = estimate_tokens(doc_chunks[doc_index][chunk_index]) + 2
+            if cost <= remaining:
+                selected[doc_index].add(chunk_index)
+                remaining -= cost
+
+        parts = []
+        for doc, chunks, keep in zip(documents, doc_chunks, selected):
+            body = []
+            previous = -1
+            for chunk_index in sorted(keep):
+                if chunk_index != previous + 1:
+                    body.append("[…]")
+                body.append(chunks[chunk_index])
+                previous = chunk_index
+            if previous != len(chunks) - 1:
+                body.append("[…]")
+            parts.append(doc.render("\n\n".join(body)))
+
+        context = "".join(parts)
+        stats.used_tokens = estimate_tokens(context)
+        return context, stats
@@ -0,0 +1,125 @@
+import hashlib
+import re
+from typing import Awaitable, Callable, Optional
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+SUMMARY_ID = "history-summary"
+SUMMARY_HEADER = "Summary of the earlier conversation:\n"
+REPEATED_DOCUMENT = "[same content as in a later message]"
+SUMMARY_MAX_CHARS = 4000
+
+DOCUMENT = re.compile(
+    r'(<document id="[^"]*"(?: lines="[^"]*")?>\n)(.*?)(\n</document>)', re.S
+)
+QUERY = re.compile(r"<query>\s*(.*?)\s*</query>", re.S)
+
+Summarizer = Callable[[str, list[BaseMessage]], Awaitable[str]]
+
+
+def _text(message: BaseMessage) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    return " ".join(
+        part.get("text", "") if isinstance(part, dict) else str(part)
+        for part in message.content
+    )
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[: limit - 1] + "…"
+
+
+async def extractive_summary(previous: str, messages: list[BaseMessage]) -> str:
+    """One entry per dropped turn: the user's question and the final answer.
+    The oldest entries are dropped once the summary exceeds SUMMARY_MAX_CHARS."""
+    lines = previous.split("\n- ") if previous else []
+    lines = [line if line.startswith("- ") else f"- {line}" for line in lines]
+    question = None
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            text = _text(message)
+            match = QUERY.search(text)
+            question = _shorten(match.group(1) if match else text, 160)
+        elif isinstance(message, AIMessage) and message.content and question:
+            lines.append(f"- User: {question}\n  Assistant: {_shorten(_text(message), 240)}")
+            question = None
+    if question:
+        lines.append(f"- User: {question}")
+
+    while len(lines) > 1 and sum(len(line) + 1 for line in lines) > SUMMARY_MAX_CHARS:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class HistoryManager:
+    """Keeps the message history sent to the agent bounded.
+
+    The last ``window_turns`` turns (a turn starts at a HumanMessage) are
+    kept verbatim, and at least the current one, so the model always sees
+    the query it is answering. Once ``compact_every`` more turns have piled up, the
+    older ones are folded into a single summary message at the head, so the
+    summarizer runs every few turns rather than on every turn. Document
+    bodies injected by @mentions are carried once: older copies of a body
+    that appears again later are replaced with a short marker.
+    """
+
+    def __init__(
+        self,
+        window_turns: int = 10,
+        compact_every: int = 4,
+        summarizer: Optional[Summarizer] = None,
+    ):
+        self.window_turns = max(1, window_turns)
+        self.compact_every = compact_every
+        self.summarizer: Summarizer = summarizer or extractive_summary
+
+    async def compact(self, messages: list[BaseMessage]) -> list[BaseMessage]:
+        summary = ""
+        if messages and isinstance(messages[0], SystemMessage) and messages[0].id == SUMMARY_ID:
+            summary = _text(messages[0]).removeprefix(SUMMARY_HEADER)
+            messages = messages[1:]
+
+        turn_starts = [
+            index for index, message in enumerate(messages)
+            if isinstance(message, HumanMessage)
+        ]
+        if len(turn_starts) > self.window_turns + self.compact_every:
+            cut = turn_starts[-self.window_turns]
+            summary = await self.summarizer(summary, messages[:cut])
+            messages = messages[cut:]
+
+        messages = self._dedupe_documents(messages)
+        if summary:
+            messages.insert(
+                0,
+                SystemMessage(
+                    content=SUMMARY_HEADER + summary,
+                    id=SUMMARY_ID,
+                ),
+            )
+        return messages
+
+    def _dedupe_documents(self, messages: list[BaseMessage]) -> list[BaseMessage]:
+        seen: set[tuple[str, bytes]] = set()
+
+        def replace(match: re.Match) -> str:
+            key = (match.group(1), hashlib.blake2b(match.group(2).encode()).digest())
+            if key in seen:
+                return match.group(1) + REPEATED_DOCUMENT + match.group(3)
+            seen.add(key)
+            return match.group(0)
+
+        compacted = []
+        for message in reversed(messages):
+            if (
+                isinstance(message, HumanMessage)
+                and isinstance(message.content, str)
+                and "<document" in message.content
+            ):
+                content = DOCUMENT.sub(replace, message.content)
+                if content != message.content:
+                    message = message.model_copy(update={"content": content})
+            compacted.append(message)
+        compacted.reverse()
+        return compacted
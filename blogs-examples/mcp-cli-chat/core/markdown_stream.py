@@ -0,0 +1,126 @@
+import re
+from typing import Optional
+from rich.console import Console
+from rich.live import Live
+from rich.markdown import Markdown
+from rich.segment import Segments
+
+# An opening fence: a run of at least three backticks or tildes; a backtick
+# fence's info string can't contain backticks
+FENCE = re.compile(r"(`{3,})[^`]*|(~{3,}).*")
+RULE = re.compile(r" {0,3}([-*_])(?: *\1){2,} *")
+LIST_ITEM = re.compile(r" {0,3}(?:[-+*]|\d{1,9}[.)])(?:[ \t]|$)")
+
+
+class MarkdownStream:
+    """Renders Markdown while it is still being streamed.
+
+    Text is split into blocks at blank lines outside fenced code, but only
+    once the next line shows the blank line ended a top-level block: an
+    indented line continues a list item or an indented code block, and a
+    list item after a list makes the list loose. Each finished block is
+    printed once, and only the block still being written
+    is redrawn, by a ``rich.live.Live`` display at ``refresh_per_second``.
+    Every character is scanned once, and a redraw parses only the open
+    block, however long the answer grows.
+    """
+
+    def __init__(self, console: Console, refresh_per_second: float = 12):
+        self.console = console
+        self._tail = ""
+        self._line_start = 0
+        # Marker run of the open fenced code block, if any
+        self._fence: Optional[str] = None
+        self._has_content = False
+        self._in_list = False
+        # End of the blank lines that may close the open block
+        self._pending_break: Optional[int] = None
+        self._gap_before_next = False
+        self._live: Optional[Live] = None
+        if console.is_terminal:
+            self._live = Live(
+                console=console,
+                refresh_per_second=refresh_per_second,
+                transient=True,
+                get_renderable=self._render_tail,
+            )
+            self._live.start()
+
+    def _render_tail(self) -> Markdown:
+        return Markdown(self._tail)
+
+    def feed(self, text: str):
+        self._tail += text
+        while True:
+            newline = self._tail.find("\n", self._line_start)
+            if newline < 0:
+                return
+            raw = self._tail[self._line_start : newline]
+            line = raw.strip()
+            if line and self._pending_break is not None:
+                if not self._continues_block(raw):
+                    self._commit(self._pending_break)
+                self._pending_break = None
+            self._line_start += len(raw) + 1
+            if self._fence is not None:
+                # Closed only by the same character, at least as many times,
+                # with nothing after it
+                fence = self._fence
+                if len(line) >= len(fence) and line == fence[0] * len(line):
+                    self._fence = None
+            elif match := FENCE.fullmatch(line):
+                self._fence = match.group(1) or match.group(2)
+                self._has_content = True
+            elif line:
+                self._has_content = True
+                if LIST_ITEM.match(raw):
+                    self._in_list = True
+            elif self._has_content:
+                self._pending_break = self._line_start
+
+    def _continues_block(self, line: str) -> bool:
+        """Whether ``line``, the first after blank lines, belongs to the
+        block before them."""
+        if line[:1] in (" ", "\t"):
+            return True
+        return self._in_list and LIST_ITEM.match(line) is not None
+
+    def _commit(self, end: int):
+        block, self._tail = self._tail[:end], self._tail[end:]
+        self._line_start -= end
+        self._has_content = self._in_list = False
+        # Printed above the live display, which keeps only the open block
+        self._print(block)
+
+    def _print(self, block: str):
+        segments = list(self.console.render(Markdown(block)))
+        # Markdown separates blocks with a blank line, which separately
+        # rendered blocks need back, unless the block brings its own (lists,
+        # quotes, tables) or follows a rule
+        if (
+            self._gap_before_next
+            and segments
+            and segments[0].text != "\n"
+        ):
+            self.console.print()
+        self.console.print(Segments(segments))
+        self._gap_before_next = not RULE.fullmatch(block.strip())
+
+    def close(self):
+        if self._live is not None:
+            self._live.stop()
+            self._live = None
+        if self._tail.strip():
+            self._print(self._tail)
+        self._tail = ""
+        self._line_start = 0
+        self._fence = None
+        self._has_content = self._in_list = False
+        self._pending_break = None
+        self._gap_before_next = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,123 @@
+import json
+import secrets
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Iterator, Optional
+
+
+@dataclass
+class Span:
+    """One timed operation: an MCP request or an agent model/tool step."""
+
+    method: str
+    server: Optional[str] = None
+    target: Optional[str] = None
+    start_ns: int = 0
+    duration_ms: float = 0.0
+    payload_bytes: int = 0
+    error: Optional[str] = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    span_id: str = field(default_factory=lambda: secrets.token_hex(8))
+
+    def to_otel(self, trace_id: str) -> dict:
+        """Span as an OTLP/JSON-style record."""
+        attributes = {
+            "mcp.method": self.method,
+            "mcp.server": self.server,
+            "mcp.target": self.target,
+            "payload.bytes": self.payload_bytes,
+            **self.attributes,
+        }
+        return {
+            "traceId": trace_id,
+            "spanId": self.span_id,
+            "name": f"{self.method} {self.target}" if self.target else self.method,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.start_ns + int(self.duration_ms * 1_000_000),
+            "attributes": [
+                {"key": key, "value": {"stringValue": str(value)}}
+                for key, value in attributes.items()
+                if value is not None
+            ],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+
+class Tracer:
+    """Keeps the most recent spans in memory and optionally appends every
+    span to a JSONL file, either as plain records or OTLP-style ones."""
+
+    def __init__(self, max_spans: int = 10_000):
+        self.spans: deque[Span] = deque(maxlen=max_spans)
+        self.trace_id = secrets.token_hex(16)
+        self.export_format = "jsonl"
+        self._export_file = None
+
+    def stream_to(self, path: str, export_format: str = "jsonl") -> None:
+        """Append every span recorded from now on to ``path``."""
+        self.close()
+        self.export_format = export_format
+        self._export_file = open(path, "a")
+
+    @contextmanager
+    def span(
+        self, method: str, server: Optional[str] = None, target: Optional[str] = None
+    ) -> Iterator[Span]:
+        span = Span(method=method, server=server, target=target, start_ns=time.time_ns())
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration_ms = (time.perf_counter() - started) * 1000
+            self.record(span)
+
+    def record(self, span: Span) -> None:
+        self.spans.append(span)
+        if self._export_file:
+            record = span.to_otel(self.trace_id) if self.export_format == "otel" else asdict(span)
+            self._export_file.write(json.dumps(record) + "\n")
+            self._export_file.flush()
+
+    def stats(self) -> list[dict]:
+        """Count and p50/p95/p99 duration per (server, method, target)."""
+        groups: dict[tuple, list[float]] = {}
+        for span in self.spans:
+            groups.setdefault((span.server, span.method, span.target), []).append(
+                span.duration_ms
+            )
+
+        rows = []
+        for (server, method, target), durations in sorted(
+            groups.items(), key=lambda item: tuple(part or "" for part in item[0])
+        ):
+            durations.sort()
+            rows.append(
+                {
+                    "server": server,
+                    "method": method,
+                    "target": target,
+                    "count": len(durations),
+                    "p50_ms": _percentile(durations, 0.5),
+                    "p95_ms": _percentile(durations, 0.95),
+                    "p99_ms": _percentile(durations, 0.99),
+                }
+            )
+        return rows
+
+    def close(self) -> None:
+        if self._export_file:
+            self._export_file.close()
+            self._export_file = None
+
+
+# Shared by every MCPClient and Chat in the process
+tracer = Tracer()
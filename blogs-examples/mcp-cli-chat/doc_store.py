@@ -0,0 +1,655 @@
+import hashlib
+import heapq
+import io
+import mmap
+import os
+import sqlite3
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Hashable, Iterable, Iterator, Literal, Optional
+
+from search_index import InvertedIndex, fts5_query, make_snippet, tokenize
+
+RangeUnit = Literal["bytes", "lines"]
+
+
+def _scan_prefix(prefix: str, glob: Optional[str]) -> Optional[str]:
+    """Longest literal prefix every id matching both ``prefix`` and ``glob``
+    starts with, or None if no id can match both."""
+    if not glob:
+        return prefix
+    literal = glob
+    for i, char in enumerate(glob):
+        if char in "*?[":
+            literal = glob[:i]
+            break
+    if literal.startswith(prefix):
+        return literal
+    if prefix.startswith(literal):
+        return prefix
+    return None
+
+
+def _check_range(offset: int, length: Optional[int], unit: str):
+    if offset < 0 or (length is not None and length < 0):
+        raise ValueError("offset and length must not be negative")
+    if unit not in ("bytes", "lines"):
+        raise ValueError(f"Unknown range unit {unit}")
+
+
+def _char_start(data, pos: int) -> int:
+    """``pos`` moved forward past UTF-8 continuation bytes. A character
+    belongs to the byte range holding its first byte, so adjacent ranges
+    split the text without losing or repeating any of it."""
+    while pos < len(data) and data[pos] & 0xC0 == 0x80:
+        pos += 1
+    return pos
+
+
+@dataclass(slots=True)
+class DocChanges:
+    """Documents other processes wrote since a ``change_token``."""
+
+    token: Hashable
+    added: list[str]
+    removed: list[str]
+    updated: list[str]
+
+
+class DocumentStore(ABC):
+    """Storage backend behind the document tools and resources of mcp_server.py."""
+
+    _index: Optional[InvertedIndex] = None
+    # Ids written here since a watcher asked for a change token, kept out of
+    # the changes it is told about next
+    _own_writes: Optional[set[str]] = None
+
+    def __init__(self):
+        # Held while the search index is built, and by the puts that update it
+        self._index_lock = threading.Lock()
+
+    @abstractmethod
+    def get(self, doc_id: str) -> Optional[str]: ...
+
+    @abstractmethod
+    def put(self, doc_id: str, content: str) -> None: ...
+
+    def put_many(self, items: Iterable[tuple[str, str]]) -> None:
+        for doc_id, content in items:
+            self.put(doc_id, content)
+
+    @abstractmethod
+    def ids(self) -> Iterator[str]: ...
+
+    def __contains__(self, doc_id: str) -> bool:
+        return self.get(doc_id) is not None
+
+    def list_ids(
+        self,
+        prefix: str = "",
+        glob: Optional[str] = None,
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> list[str]:
+        """Up to ``limit`` ids in sorted order that start with ``prefix``,
+        match the shell-style ``glob`` and sort after ``after``."""
+        scan = _scan_prefix(prefix, glob)
+        if scan is None:
+            return []
+        matches = (
+            doc_id
+            for doc_id in self.ids()
+            if doc_id.startswith(scan)
+            and (after is None or doc_id > after)
+            and (glob is None or fnmatchcase(doc_id, glob))
+        )
+        if limit is None:
+            return sorted(matches)
+        return heapq.nsmallest(limit, matches)
+
+    def version(self) -> Optional[Hashable]:
+        """A token that changes when another process may have added or removed
+        documents; None when nothing outside this process writes the store."""
+        return None
+
+    def change_token(self) -> Hashable:
+        """Marks the current state of the store for ``changes_since``."""
+        if self._own_writes is None:
+            self._own_writes = set()
+        return frozenset(self.ids())
+
+    def changes_since(self, token: Hashable) -> Optional[DocChanges]:
+        """What other processes changed since ``token``, or None if the store
+        can no longer tell and readers have to relist. This fallback compares
+        id sets, so it reports no rewritten documents; stores that use it
+        add what they write to ``_own_writes``."""
+        ids = frozenset(self.ids())
+        own = self._own_writes or set()
+        # Writes not listed yet are left out next time
+        self._own_writes = own - ids
+        return DocChanges(ids, sorted(ids - token - own), sorted(token - ids), [])
+
+    def read_range(
+        self,
+        doc_id: str,
+        offset: int = 0,
+        length: Optional[int] = None,
+        unit: RangeUnit = "bytes",
+    ) -> Optional[str]:
+        """Return ``length`` bytes or lines of a document starting at ``offset``
+        (0-based), or everything after ``offset`` when ``length`` is None."""
+        _check_range(offset, length, unit)
+        content = self.get(doc_id)
+        if content is None:
+            return None
+
+        end = None if length is None else offset + length
+        if unit == "lines":
+            # Only "\n" ends a line, matching FileDocumentStore's line index
+            lines = io.StringIO(content, newline="\n").readlines()
+            return "".join(lines[offset:end])
+        data = content.encode()
+        end = len(data) if end is None else min(end, len(data))
+        return data[_char_start(data, offset) : _char_start(data, end)].decode()
+
+    def search(self, query: str, limit: int = 10) -> list[dict]:
+        """Rank documents against ``query`` with BM25 and return ids, scores and
+        snippets. The index is built on first use and kept current by put()."""
+        index = self._index
+        if index is None:
+            with self._index_lock:
+                index = self._index
+                if index is None:
+                    # Published only once complete; a put meanwhile waits in
+                    # _reindex and is applied on top
+                    index = InvertedIndex()
+                    for doc_id in self.ids():
+                        index.add(doc_id, self.get(doc_id) or "")
+                    self._index = index
+
+        terms = set(tokenize(query))
+        return [
+            {
+                "doc_id": doc_id,
+                "score": round(score, 6),
+                "snippet": make_snippet(self.get(doc_id) or "", terms),
+            }
+            for doc_id, score in index.search(query, limit)
+        ]
+
+    def _reindex(self, doc_id: str, content: str) -> None:
+        with self._index_lock:
+            if self._index is not None:
+                self._index.add(doc_id, content)
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryDocumentStore(DocumentStore):
+    def __init__(self, docs: Optional[dict[str, str]] = None):
+        super().__init__()
+        self.docs: dict[str, str] = dict(docs or {})
+
+    def get(self, doc_id: str) -> Optional[str]:
+        return self.docs.get(doc_id)
+
+    def put(self, doc_id: str, content: str) -> None:
+        self.docs[doc_id] = content
+        self._reindex(doc_id, content)
+
+    def ids(self) -> Iterator[str]:
+        return iter(list(self.docs))
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.docs
+
+
+class SQLiteDocumentStore(DocumentStore):
+    """Documents persisted in SQLite.
+
+    ``documents`` maps each id to the sha256 of its content, and ``blobs``
+    holds every distinct content once. Nothing is loaded up front; each
+    lookup is a primary-key read, so opening a large store is instant.
+    ``documents_fts`` is an FTS5 index over the documents, when SQLite is
+    built with FTS5 (``fts_rows`` maps ids to its rowids so an edit rewrites
+    one row); otherwise search falls back to the in-memory index.
+
+    ``changes`` logs every write with the store instance it came from, so a
+    watcher reads only what other processes changed since it last looked.
+    The one connection is shared by the server's tool threads, so every use
+    of it holds ``_lock``.
+    """
+
+    # Log entries kept; a watcher further behind than this relists
+    CHANGE_LOG_ROWS = 10_000
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._origin = uuid.uuid4().hex
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                content TEXT NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS documents (
+                id TEXT PRIMARY KEY,
+                hash TEXT NOT NULL REFERENCES blobs(hash)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS documents_hash ON documents(hash);
+            CREATE TABLE IF NOT EXISTS changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT NOT NULL,
+                op TEXT NOT NULL,
+                origin TEXT
+            );
+            -- Stores never delete; this catches documents removed by hand
+            CREATE TRIGGER IF NOT EXISTS documents_deleted AFTER DELETE ON documents
+            BEGIN
+                INSERT INTO changes (id, op) VALUES (old.id, 'removed');
+            END;
+            """
+        )
+        self.has_fts = self._create_fts()
+
+    def _create_fts(self) -> bool:
+        try:
+            with self.conn:
+                # sqlite3 opens no transaction for DDL by itself; without one,
+                # another process opening a new store could find
+                # documents_fts before fts_rows exists
+                self.conn.execute("BEGIN IMMEDIATE")
+                exists = self.conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'documents_fts'"
+                ).fetchone()
+                if exists:
+                    return True
+                self.conn.execute(
+                    "CREATE VIRTUAL TABLE documents_fts USING fts5(id UNINDEXED, content)"
+                )
+                self.conn.execute(
+                    "CREATE TABLE fts_rows (id TEXT PRIMARY KEY, row INTEGER NOT NULL)"
+                    " WITHOUT ROWID"
+                )
+                # Backfill stores created before the index existed
+                self.conn.execute(
+                    "INSERT INTO documents_fts (id, content) SELECT d.id, b.content"
+                    " FROM documents d JOIN blobs b ON b.hash = d.hash"
+                )
+                self.conn.execute(
+                    "INSERT INTO fts_rows (id, row) SELECT id, rowid FROM documents_fts"
+                )
+        except sqlite3.OperationalError as e:
+            # Anything else, e.g. a lock held too long, must not quietly
+            # leave this connection without the index others keep writing
+            if "no such module" in str(e):
+                return False
+            raise
+        return True
+
+    def get(self, doc_id: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT b.content FROM documents d JOIN blobs b ON b.hash = d.hash"
+                " WHERE d.id = ?",
+                (doc_id,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, doc_id: str, content: str) -> None:
+        self.put_many([(doc_id, content)])
+
+    def put_many(self, items: Iterable[tuple[str, str]]) -> None:
+        """Write many documents in a single transaction."""
+        items = list(items)
+        with self._lock, self.conn:
+            for doc_id, content in items:
+                self._put(doc_id, content)
+            self.conn.execute(
+                "DELETE FROM changes WHERE seq <= (SELECT max(seq) FROM changes) - ?",
+                (self.CHANGE_LOG_ROWS,),
+            )
+        # Only once committed, so a rolled back batch leaves the index alone
+        for doc_id, content in items:
+            self._reindex(doc_id, content)
+
+    def _put(self, doc_id: str, content: str) -> None:
+        digest = hashlib.sha256(content.encode()).hexdigest()
+        row = self.conn.execute(
+            "SELECT hash FROM documents WHERE id = ?", (doc_id,)
+        ).fetchone()
+        self.conn.execute(
+            "INSERT OR IGNORE INTO blobs (hash, content) VALUES (?, ?)",
+            (digest, content),
+        )
+        # An upsert rather than REPLACE, which would delete the row first
+        self.conn.execute(
+            "INSERT INTO documents (id, hash) VALUES (?, ?)"
+            " ON CONFLICT (id) DO UPDATE SET hash = excluded.hash",
+            (doc_id, digest),
+        )
+        if row and row[0] == digest:
+            return
+        if row:
+            self._drop_unreferenced(row[0])
+        if self.has_fts:
+            self._index_fts(doc_id, content)
+        self.conn.execute(
+            "INSERT INTO changes (id, op, origin) VALUES (?, ?, ?)",
+            (doc_id, "added" if row is None else "updated", self._origin),
+        )
+
+    def _index_fts(self, doc_id: str, content: str) -> None:
+        fts_row = self.conn.execute(
+            "SELECT row FROM fts_rows WHERE id = ?", (doc_id,)
+        ).fetchone()
+        if fts_row:
+            self.conn.execute("DELETE FROM documents_fts WHERE rowid = ?", fts_row)
+            self.conn.execute(
+                "INSERT INTO documents_fts (rowid, id, content) VALUES (?, ?, ?)",
+                (fts_row[0], doc_id, content),
+            )
+        else:
+            cursor = self.conn.execute(
+                "INSERT INTO documents_fts (id, content) VALUES (?, ?)",
+                (doc_id, content),
+            )
+            self.conn.execute(
+                "INSERT INTO fts_rows (id, row) VALUES (?, ?)", (doc_id, cursor.lastrowid)
+            )
+
+    def search(self, query: str, limit: int = 10) -> list[dict]:
+        if not self.has_fts:
+            return super().search(query, limit)
+
+        match = fts5_query(query)
+        if match is None:
+            return []
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, bm25(documents_fts),"
+                " snippet(documents_fts, 1, '', '', '…', 16)"
+                " FROM documents_fts WHERE documents_fts MATCH ?"
+                " ORDER BY bm25(documents_fts) LIMIT ?",
+                (match, limit),
+            ).fetchall()
+        # bm25() is lower-is-better; flip it so higher scores rank first
+        return [
+            {"doc_id": doc_id, "score": round(-score, 6), "snippet": snippet}
+            for doc_id, score, snippet in rows
+        ]
+
+    def _drop_unreferenced(self, digest: str) -> None:
+        self.conn.execute(
+            "DELETE FROM blobs WHERE hash = ?"
+            " AND NOT EXISTS (SELECT 1 FROM documents WHERE hash = ?)",
+            (digest, digest),
+        )
+
+    def ids(self) -> Iterator[str]:
+        # Fetched in batches, so other threads get the connection in between
+        with self._lock:
+            cursor = self.conn.execute("SELECT id FROM documents ORDER BY id")
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(1000)
+            if not rows:
+                return
+            for (doc_id,) in rows:
+                yield doc_id
+
+    def list_ids(
+        self,
+        prefix: str = "",
+        glob: Optional[str] = None,
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> list[str]:
+        scan = _scan_prefix(prefix, glob)
+        if scan is None:
+            return []
+        # A range scan on the primary key; the glob is applied here rather
+        # than with SQLite's GLOB so both stores agree on its syntax
+        query = "SELECT id FROM documents WHERE id >= ?"
+        params: list = [max(scan, after or "")]
+        if scan:
+            query += " AND id < ?"
+            params.append(scan[:-1] + chr(ord(scan[-1]) + 1))
+        if after is not None:
+            query += " AND id != ?"
+            params.append(after)
+        ids = []
+        with self._lock:
+            for (doc_id,) in self.conn.execute(query + " ORDER BY id", params):
+                if glob is None or fnmatchcase(doc_id, glob):
+                    ids.append(doc_id)
+                    if limit is not None and len(ids) >= limit:
+                        break
+        return ids
+
+    def __contains__(self, doc_id: str) -> bool:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM documents WHERE id = ?", (doc_id,)
+            ).fetchone()
+        return row is not None
+
+    def version(self) -> Optional[Hashable]:
+        # Changes on every commit made through another connection
+        with self._lock:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def change_token(self) -> Hashable:
+        with self._lock:
+            return self.conn.execute(
+                "SELECT coalesce(max(seq), 0) FROM changes"
+            ).fetchone()[0]
+
+    def changes_since(self, token: Hashable) -> Optional[DocChanges]:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT seq, id, op, origin FROM changes WHERE seq > ? ORDER BY seq",
+                (token,),
+            ).fetchall()
+        if not rows:
+            return DocChanges(token, [], [], [])
+        # Sequence numbers have no gaps, so a missing one was pruned
+        if rows[0][0] > token + 1:
+            return None
+        first: dict[str, str] = {}
+        last: dict[str, str] = {}
+        for _, doc_id, op, origin in rows:
+            if origin != self._origin:
+                first.setdefault(doc_id, op)
+                last[doc_id] = op
+        added, removed, updated = [], [], []
+        for doc_id, op in sorted(last.items()):
+            if first[doc_id] == "added":
+                if op != "removed":
+                    added.append(doc_id)
+            elif op == "removed":
+                removed.append(doc_id)
+            else:
+                updated.append(doc_id)
+        return DocChanges(rows[-1][0], added, removed, updated)
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            row = self.conn.execute("SELECT 1 FROM documents LIMIT 1").fetchone()
+        return row is None
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+
+class FileDocumentStore(DocumentStore):
+    """One UTF-8 file per document in a flat directory; the file name is the id.
+
+    Range reads go through ``mmap`` so only the requested slice of a large
+    file is paged in. Newlines are counted once per file version.
+    """
+
+    LINE_CHUNK = 64 * 1024
+
+    def __init__(self, root: str):
+        super().__init__()
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._line_counts: dict[str, tuple[tuple[int, int], array]] = {}
+        # Directory mtime the search index was built at; renames by other
+        # processes sharing the directory bump it
+        self._index_version: Optional[int] = None
+
+    @staticmethod
+    def _is_valid_id(doc_id: str) -> bool:
+        return bool(doc_id) and not doc_id.startswith(".") and not any(
+            sep in doc_id for sep in ("/", "\\")
+        )
+
+    def _path(self, doc_id: str) -> Optional[Path]:
+        if not self._is_valid_id(doc_id):
+            return None
+        path = self.root / doc_id
+        return path if path.is_file() else None
+
+    def get(self, doc_id: str) -> Optional[str]:
+        path = self._path(doc_id)
+        if path is None:
+            return None
+        return path.read_text(encoding="utf-8", errors="replace")
+
+    def put(self, doc_id: str, content: str) -> None:
+        if not self._is_valid_id(doc_id):
+            raise ValueError(f"Invalid doc id {doc_id}")
+        tmp_path = self.root / f".{doc_id}.tmp"
+        tmp_path.write_text(content, encoding="utf-8")
+        os.replace(tmp_path, self.root / doc_id)
+        if self._own_writes is not None:
+            self._own_writes.add(doc_id)
+        if self._index is not None:
+            self._index_version = self.root.stat().st_mtime_ns
+        self._reindex(doc_id, content)
+
+    def search(self, query: str, limit: int = 10) -> list[dict]:
+        version = self.root.stat().st_mtime_ns
+        if version != self._index_version:
+            self._index = None
+            self._index_version = version
+        return super().search(query, limit)
+
+    def version(self) -> Optional[Hashable]:
+        # Files are created, removed and replaced by renames in the directory
+        return self.root.stat().st_mtime_ns
+
+    def ids(self) -> Iterator[str]:
+        return iter(
+            sorted(
+                entry.name
+                for entry in os.scandir(self.root)
+                if entry.is_file() and not entry.name.startswith(".")
+            )
+        )
+
+    def __contains__(self, doc_id: str) -> bool:
+        return self._path(doc_id) is not None
+
+    def _line_index(self, doc_id: str, mm: mmap.mmap, version: tuple[int, int]) -> array:
+        # Newlines up to the end of each LINE_CHUNK bytes, counted in C; a
+        # line is then found by scanning a single chunk
+        cached = self._line_counts.get(doc_id)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        counts = array("Q")
+        total = 0
+        for start in range(0, len(mm), self.LINE_CHUNK):
+            total += mm[start : start + self.LINE_CHUNK].count(b"\n")
+            counts.append(total)
+        self._line_counts[doc_id] = (version, counts)
+        return counts
+
+    def _line_start(self, mm: mmap.mmap, counts: array, line: int) -> Optional[int]:
+        """Byte offset where 0-based ``line`` starts, None past the last line."""
+        if line == 0:
+            return 0
+        chunk = bisect_left(counts, line)
+        if chunk == len(counts):
+            return None
+        pos = chunk * self.LINE_CHUNK - 1
+        for _ in range(line - (counts[chunk - 1] if chunk else 0)):
+            pos = mm.find(b"\n", pos + 1)
+        return pos + 1 if pos + 1 < len(mm) else None
+
+    def read_range(
+        self,
+        doc_id: str,
+        offset: int = 0,
+        length: Optional[int] = None,
+        unit: RangeUnit = "bytes",
+    ) -> Optional[str]:
+        _check_range(offset, length, unit)
+        path = self._path(doc_id)
+        if path is None:
+            return None
+
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size == 0:
+                return ""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                size = len(mm)
+                if unit == "lines":
+                    counts = self._line_index(
+                        doc_id, mm, (stat.st_mtime_ns, stat.st_size)
+                    )
+                    start = self._line_start(mm, counts, offset)
+                    if start is None:
+                        return ""
+                    end = None
+                    if length is not None:
+                        end = self._line_start(mm, counts, offset + length)
+                    if end is None:
+                        end = size
+                else:
+                    start = _char_start(mm, min(offset, size))
+                    end = size if length is None else min(size, offset + length)
+                    end = _char_start(mm, end)
+                return mm[start:end].decode(errors="replace")
+
+
+def open_store(url: Optional[str], seed: dict[str, str]) -> DocumentStore:
+    """Open the store named by ``url``: "memory" (default), "sqlite:///<path>"
+    or "files:///<directory>".
+
+    ``seed`` documents are loaded into a new, empty store.
+    """
+    if not url or url == "memory":
+        return MemoryDocumentStore(seed)
+
+    if url.startswith("sqlite:///"):
+        store = SQLiteDocumentStore(url[len("sqlite:///") :])
+        if store.is_empty():
+            store.put_many(seed.items())
+        return store
+
+    if url.startswith("files:///"):
+        store = FileDocumentStore(url[len("files://") :])
+        if next(store.ids(), None) is None:
+            for doc_id, content in seed.items():
+                store.put(doc_id, content)
+        return store
+
+    raise ValueError(f"Unsupported document store: {url}")
@@ -0,0 +1,160 @@
+from typing import Iterator, Optional
+
+from pydantic import BaseModel, Field
+
+# Past this many pieces an edit is dense enough that one C-level
+# str.replace over the materialized text is cheaper than splitting pieces.
+MAX_PIECES = 512
+
+
+class DocumentEdit(BaseModel):
+    old_str: str = Field(
+        description="The text to replace. Must match exactly, including whitespace"
+    )
+    new_str: str = Field(description="The new text to insert in place of the old text")
+    expected_matches: Optional[int] = Field(
+        default=None,
+        description="If set, the batch fails unless old_str occurs exactly this many times",
+    )
+
+
+class EditError(ValueError):
+    pass
+
+
+class PieceTable:
+    """Text stored as pieces referencing immutable buffers.
+
+    Replacing text only splits pieces and adds a buffer for the new string,
+    so a batch of edits copies the document once, when ``text()`` is called,
+    instead of once per edit as chained ``str.replace`` calls do.
+    """
+
+    def __init__(self, text: str):
+        self._reset(text)
+
+    def _reset(self, text: str):
+        self._buffers: list[str] = [text]
+        self._pieces: list[tuple[int, int, int]] = [(0, 0, len(text))] if text else []
+        self._length = len(text)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def text(self) -> str:
+        buffers = self._buffers
+        return "".join(buffers[b][start : start + n] for b, start, n in self._pieces)
+
+    def find_all(self, pattern: str) -> list[int]:
+        """Offsets of the non-overlapping occurrences of ``pattern``, left to right."""
+        m = len(pattern)
+        if m == 0:
+            raise EditError("old_str must not be empty")
+
+        matches: list[int] = []
+        next_allowed = 0
+        # Tail of the text before the current piece, to catch matches that
+        # straddle piece boundaries
+        carry = ""
+        base = 0
+        for b, start, n in self._pieces:
+            buffer = self._buffers[b]
+
+            if carry:
+                window = carry + buffer[start : start + min(n, m - 1)]
+                carry_start = base - len(carry)
+                pos = window.find(pattern, max(0, next_allowed - carry_start))
+                while pos != -1 and pos < len(carry):
+                    matches.append(carry_start + pos)
+                    next_allowed = carry_start + pos + m
+                    pos = window.find(pattern, pos + m)
+
+            pos = buffer.find(pattern, start + max(0, next_allowed - base), start + n)
+            while pos != -1:
+                offset = base + pos - start
+                matches.append(offset)
+                next_allowed = offset + m
+                pos = buffer.find(pattern, pos + m, start + n)
+
+            if m > 1:
+                tail = buffer[max(start, start + n - (m - 1)) : start + n]
+                carry = (carry + tail)[-(m - 1) :]
+            base += n
+
+        return matches
+
+    def _cut(self, ranges: list[tuple[int, int]]) -> Iterator[list[tuple[int, int, int]]]:
+        """Yield the pieces covering each of the ascending, disjoint ``ranges``."""
+        pieces = self._pieces
+        i = 0
+        base = 0
+        for lo, hi in ranges:
+            while i < len(pieces) and base + pieces[i][2] <= lo:
+                base += pieces[i][2]
+                i += 1
+
+            covering = []
+            j, j_base = i, base
+            while j < len(pieces) and j_base < hi:
+                b, start, n = pieces[j]
+                a, z = max(lo, j_base), min(hi, j_base + n)
+                if a < z:
+                    covering.append((b, start + a - j_base, z - a))
+                j_base += n
+                j += 1
+            yield covering
+
+    def replace_all(self, old: str, new: str, matches: Optional[list[int]] = None) -> int:
+        if matches is None:
+            matches = self.find_all(old)
+        if not matches:
+            return 0
+
+        if len(self._pieces) + 2 * len(matches) > MAX_PIECES:
+            self._reset(self.text().replace(old, new))
+            return len(matches)
+
+        m = len(old)
+        keep: list[tuple[int, int]] = []
+        prev = 0
+        for offset in matches:
+            keep.append((prev, offset))
+            prev = offset + m
+        keep.append((prev, self._length))
+
+        new_piece = None
+        if new:
+            self._buffers.append(new)
+            new_piece = (len(self._buffers) - 1, 0, len(new))
+
+        pieces: list[tuple[int, int, int]] = []
+        for index, covering in enumerate(self._cut(keep)):
+            if index and new_piece:
+                pieces.append(new_piece)
+            pieces.extend(covering)
+
+        self._pieces = pieces
+        self._length += len(matches) * (len(new) - m)
+        return len(matches)
+
+
+def apply_edits(text: str, edits: list[DocumentEdit]) -> tuple[str, list[int]]:
+    """Apply ``edits`` in order, each seeing the result of the previous ones.
+
+    Returns the new text and the number of replacements per edit. Raises
+    EditError, without producing any text, if an edit matches nothing or not
+    its ``expected_matches`` count, so a batch is all-or-nothing.
+    """
+    table = PieceTable(text)
+    counts: list[int] = []
+    for index, edit in enumerate(edits):
+        matches = table.find_all(edit.old_str)
+        if not matches:
+            raise EditError(f"Edit {index}: old_str not found")
+        if edit.expected_matches is not None and len(matches) != edit.expected_matches:
+            raise EditError(
+                f"Edit {index}: expected {edit.expected_matches} matches, found {len(matches)}"
+            )
+        counts.append(table.replace_all(edit.old_str, edit.new_str, matches))
+
+    return table.text(), counts
@@ -0,0 +1,192 @@
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional
+from xml.etree import ElementTree
+
+from doc_store import DocumentStore
+
+TEXT_SUFFIXES = {".md", ".markdown", ".txt", ".rst", ".csv"}
+SUFFIXES = TEXT_SUFFIXES | {".docx", ".pdf"}
+
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+@dataclass(slots=True)
+class SourceFile:
+    doc_id: str
+    path: str
+    size: int
+    mtime_ns: int
+    # Parsed before with another size or mtime; it may only have been touched
+    parsed_before: bool = False
+
+
+def scan_directory(directory: str) -> Iterator[SourceFile]:
+    """Supported files directly in ``directory``; the file name is the doc id."""
+    for entry in os.scandir(directory):
+        suffix = Path(entry.name).suffix.lower()
+        if entry.name.startswith(".") or suffix not in SUFFIXES or not entry.is_file():
+            continue
+        stat = entry.stat()
+        yield SourceFile(entry.name, entry.path, stat.st_size, stat.st_mtime_ns)
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_plain_text(path: str) -> bool:
+    # Only decoded, which isn't worth sending to a worker process
+    return Path(path).suffix.lower() in TEXT_SUFFIXES
+
+
+def parse_file(path: str) -> tuple[str, str]:
+    """Hash and extract the text of ``path`` from a single read. Runs in a
+    worker process unless the file is plain text."""
+    with open(path, "rb") as f:
+        data = f.read()
+    return hashlib.sha256(data).hexdigest(), extract_text(path, data)
+
+
+def extract_text(path: str, data: bytes) -> str:
+    suffix = Path(path).suffix.lower()
+    if suffix == ".docx":
+        return _docx_text(data)
+    if suffix == ".pdf":
+        return _pdf_text(data)
+    return data.decode("utf-8", errors="replace")
+
+
+def _docx_text(data: bytes) -> str:
+    # A .docx is a zip; the body text is in word/document.xml
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        root = ElementTree.fromstring(archive.read("word/document.xml"))
+    paragraphs = []
+    for paragraph in root.iter(f"{WORD_NS}p"):
+        parts = []
+        for node in paragraph.iter():
+            if node.tag == f"{WORD_NS}t":
+                parts.append(node.text or "")
+            elif node.tag == f"{WORD_NS}tab":
+                parts.append("\t")
+            elif node.tag in (f"{WORD_NS}br", f"{WORD_NS}cr"):
+                parts.append("\n")
+        paragraphs.append("".join(parts))
+    return "\n".join(paragraphs)
+
+
+def _pdf_text(data: bytes) -> str:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise RuntimeError("Reading PDFs needs pypdf (pip install pypdf)") from None
+    reader = PdfReader(io.BytesIO(data))
+    return "\n\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+class ParsedTextCache:
+    """Text extracted from source files, kept in SQLite across restarts.
+
+    ``texts`` maps a content hash to its text, and ``files`` maps each path
+    to the size, mtime and hash it had when last parsed. A file whose size
+    and mtime still match is taken from the cache without being read; one
+    that was touched but not changed is recognised by its hash.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS texts (
+                hash TEXT PRIMARY KEY,
+                text TEXT NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                hash TEXT NOT NULL
+            ) WITHOUT ROWID;
+            """
+        )
+
+    def record(self, path: str) -> Optional[tuple[int, int, str]]:
+        """Size, mtime and hash ``path`` had when it was last parsed."""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT size, mtime_ns, hash FROM files WHERE path = ?", (path,)
+            ).fetchone()
+
+    def text(self, digest: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT text FROM texts WHERE hash = ?", (digest,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, source: SourceFile, digest: str, text: Optional[str] = None):
+        """Record that ``source`` has content ``digest``, and its text if new."""
+        with self._lock, self.conn:
+            if text is not None:
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO texts (hash, text) VALUES (?, ?)",
+                    (digest, text),
+                )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, hash)"
+                " VALUES (?, ?, ?, ?)",
+                (source.path, source.size, source.mtime_ns, digest),
+            )
+
+    def retain(self, paths: set[str]):
+        """Forget files other than ``paths``, and texts no file has any more."""
+        with self._lock, self.conn:
+            known = [row[0] for row in self.conn.execute("SELECT path FROM files")]
+            self.conn.executemany(
+                "DELETE FROM files WHERE path = ?",
+                [(path,) for path in known if path not in paths],
+            )
+            self.conn.execute(
+                "DELETE FROM texts WHERE hash NOT IN (SELECT hash FROM files)"
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+def plan(
+    directory: str, cache: ParsedTextCache, store: DocumentStore
+) -> tuple[list[tuple[str, str]], list[SourceFile]]:
+    """Split the files of ``directory`` into cached texts the store lacks,
+    as (doc_id, text) pairs, and files that have to be read again. Files
+    unchanged since they were stored are left out of both."""
+    files = list(scan_directory(directory))
+    cache.retain({source.path for source in files})
+    cached: list[tuple[str, str]] = []
+    stale: list[SourceFile] = []
+    for source in files:
+        record = cache.record(source.path)
+        if record is None:
+            stale.append(source)
+        elif record[:2] != (source.size, source.mtime_ns):
+            source.parsed_before = True
+            stale.append(source)
+        elif source.doc_id not in store:
+            text = cache.text(record[2])
+            if text is None:
+                stale.append(source)
+            else:
+                cached.append((source.doc_id, text))
+    return cached, stale
@@ -2,15 +2,19 @@ import asyncio
 import sys
 import os
 from dotenv import load_dotenv
-from contextlib import AsyncExitStack
 
-from mcp_client import MCPClient
+from mcp_client import HTTPMCPClient, MCPClient, MCPClientGroup
+from mcp_pool import MCPClientPool
 
 from core.cli_chat import CliChat
 from core.cli import CliApp
+from core.tracing import tracer
 
 load_dotenv()
 
+if os.getenv("TRACE_FILE"):
+    tracer.stream_to(os.getenv("TRACE_FILE"), os.getenv("TRACE_FORMAT", "jsonl"))
+
 async def main():
     server_scripts = sys.argv[1:]
     clients = {}
@@ -21,22 +25,55 @@ async def main():
         else ("python", ["mcp_server.py"])
     )
 
-    async with AsyncExitStack() as stack:
-        doc_client = await stack.enter_async_context(
-            MCPClient(command=command, args=args)
+    max_concurrency = int(os.getenv("MCP_MAX_CONCURRENCY", "8"))
+    doc_client_options = dict(
+        name="doc_client",
+        tool_cache_bytes=int(os.getenv("TOOL_CACHE_BYTES", "0")),
+        tool_cache_ttl=float(os.getenv("TOOL_CACHE_TTL", "300")),
+        max_concurrency=max_concurrency,
+        resource_cache_bytes=int(
+            os.getenv("RESOURCE_CACHE_BYTES", str(8 * 1024 * 1024))
+        ),
+    )
+    pool_size = int(os.getenv("MCP_POOL_SIZE", "1"))
+    if pool_size > 1 and os.getenv("DOC_STORE", "memory") == "memory":
+        print("MCP_POOL_SIZE needs a shared DOC_STORE (sqlite or files); using one server.")
+        pool_size = 1
+    if os.getenv("MCP_SERVER_URL"):
+        # Share an already running document server instead of spawning one
+        clients["doc_client"] = HTTPMCPClient(
+            os.getenv("MCP_SERVER_URL"), **doc_client_options
+        )
+    elif pool_size > 1:
+        clients["doc_client"] = MCPClientPool(
+            command=command, args=args, size=pool_size, **doc_client_options
+        )
+    else:
+        clients["doc_client"] = MCPClient(
+            command=command, args=args, **doc_client_options
+        )
+
+    for i, server_script in enumerate(server_scripts):
+        client_id = f"client_{i}_{server_script}"
+        clients[client_id] = MCPClient(
+            command="uv",
+            args=["run", server_script],
+            name=client_id,
+            max_concurrency=max_concurrency,
         )
-        clients["doc_client"] = doc_client
 
-        for i, server_script in enumerate(server_scripts):
-            client_id = f"client_{i}_{server_script}"
-            client = await stack.enter_async_context(
-                MCPClient(command="uv", args=["run", server_script])
-            )
-            clients[client_id] = client
+    # Spawn and initialize every server at once instead of one after another
+    connect_timeout = float(os.getenv("MCP_CONNECT_TIMEOUT", "30"))
+    async with MCPClientGroup(clients, timeout=connect_timeout) as group:
+        doc_client = group.clients.get("doc_client")
+        if doc_client is None:
+            print("Could not start the document server, exiting.")
+            return
 
         chat = CliChat(
             doc_client=doc_client,
-            clients=clients,
+            clients=group.clients,
+            context_token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "8000")),
         )
 
         cli = CliApp(chat)
@@ -1,13 +1,54 @@
 import sys
 import asyncio
-from typing import Optional, Any
+from typing import Optional, Any, Callable
 from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+import anyio
 from mcp import ClientSession, StdioServerParameters, types
+from mcp.client.sse import sse_client
 from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
 
 import json
 from pydantic import AnyUrl
 
+from core.cache import LRUCache
+from core.tracing import tracer
+
+_MISSING = object()
+
+
+class _JSONText(str):
+    """Raw text of a cached JSON resource, parsed again on every hit so
+    callers can't change the cached value through the one they got."""
+
+
+def _content_size(contents) -> int:
+    # Text length is a cheap stand-in for payload size; it avoids
+    # re-serializing every result just to measure it
+    return sum(
+        len(getattr(item, "text", None) or getattr(item, "blob", None) or "")
+        for item in contents
+    )
+
+
+@dataclass(slots=True)
+class ResourceChanges:
+    """Resource URIs a server announced as added, removed or updated."""
+
+    added: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    updated: list[str] = field(default_factory=list)
+
+
+def _closed_stream_error(error: BaseException) -> bool:
+    """Whether ``error`` is, or groups only, writes to an already closed
+    stream, as when a notification arrives while the session shuts down."""
+    if isinstance(error, (anyio.BrokenResourceError, anyio.ClosedResourceError)):
+        return True
+    errors = getattr(error, "exceptions", None)
+    return bool(errors) and all(_closed_stream_error(e) for e in errors)
+
 
 async def logging_callback(params: types.LoggingMessageNotificationParams):
     print(params.data, file=sys.stderr)
@@ -19,27 +60,68 @@ class MCPClient:
         command: str,
         args: list[str],
         env: Optional[dict] = None,
+        resource_cache_bytes: int = 0,
+        name: Optional[str] = None,
+        tool_cache_bytes: int = 0,
+        tool_cache_ttl: Optional[float] = None,
+        max_concurrency: int = 8,
     ):
+        # Server id used in tracing spans
+        self.name = name or " ".join([command, *args])
         self._command = command
         self._args = args
         self._env = env
+        # Resource bodies are cached only for servers that announce edits via
+        # notifications/resources/updated; 0 disables the cache.
+        self.resource_cache: Optional[LRUCache] = (
+            LRUCache(resource_cache_bytes) if resource_cache_bytes > 0 else None
+        )
+        # Results of tools annotated read-only, keyed on name and arguments;
+        # any other tool call on this server clears it. 0 disables it.
+        self.tool_cache: Optional[LRUCache] = (
+            LRUCache(tool_cache_bytes, ttl=tool_cache_ttl)
+            if tool_cache_bytes > 0
+            else None
+        )
+        self._tool_annotations: dict[str, Optional[types.ToolAnnotations]] = {}
+        # The agent runs all tool calls of a step at once; cap how many are in
+        # flight on this server and run the mutating ones one at a time, in
+        # the order they were issued.
+        self._call_slots = asyncio.Semaphore(max_concurrency)
+        self._mutation_lock = asyncio.Lock()
         self._session: Optional[ClientSession] = None
         self._exit_stack: AsyncExitStack = AsyncExitStack()
+        # Catalog caches, dropped only on list_changed notifications or refresh()
+        self._tools: Optional[list[types.Tool]] = None
+        self._prompts: Optional[list[types.Prompt]] = None
+        self._resources: Optional[list[types.Resource]] = None
+        self._list_changed_listeners: list[Callable[[str], None]] = []
+        self._resource_listeners: list[
+            Callable[[Optional[ResourceChanges]], None]
+        ] = []
 
-    async def connect(self):
+    async def _open_transport(self):
         server_params = StdioServerParameters(
             command=self._command,
             args=self._args,
             env=self._env,
         )
-        stdio_transport = await self._exit_stack.enter_async_context(
+        return await self._exit_stack.enter_async_context(
             stdio_client(server_params)
         )
-        _stdio, _write = stdio_transport
-        self._session = await self._exit_stack.enter_async_context(
-            ClientSession(_stdio, _write, logging_callback=logging_callback)
-        )
-        await self._session.initialize()
+
+    async def connect(self):
+        with tracer.span("connect", self.name):
+            _stdio, _write = await self._open_transport()
+            self._session = await self._exit_stack.enter_async_context(
+                ClientSession(
+                    _stdio,
+                    _write,
+                    logging_callback=logging_callback,
+                    message_handler=self._handle_message,
+                )
+            )
+            await self._session.initialize()
 
     def session(self) -> ClientSession:
         if self._session is None:
@@ -48,45 +130,315 @@ class MCPClient:
             )
         return self._session
 
+    async def _handle_message(self, message) -> None:
+        if not isinstance(message, types.ServerNotification):
+            return
+
+        match message.root:
+            case types.ToolListChangedNotification():
+                self._invalidate("tools")
+                self._clear_tool_cache()
+            case types.PromptListChangedNotification():
+                self._invalidate("prompts")
+            case types.ResourceListChangedNotification(params=params):
+                self._invalidate("resources")
+                self._clear_tool_cache()
+                changes = self._parse_changes(params)
+                if self.resource_cache is not None:
+                    if changes is None:
+                        self.resource_cache.clear()
+                    elif changes.added or changes.removed:
+                        for uri in changes.removed:
+                            self.resource_cache.invalidate(uri)
+                        # Listings are the JSON resources; documents stay
+                        self.resource_cache.invalidate_values(
+                            lambda value: isinstance(value, _JSONText)
+                        )
+                self._notify_resources(changes)
+            case types.ResourceUpdatedNotification(params=params):
+                # Data changed behind our back (possibly by another client)
+                self._clear_tool_cache()
+                if self.resource_cache is not None:
+                    self.resource_cache.invalidate(str(params.uri))
+                self._notify_resources(ResourceChanges(updated=[str(params.uri)]))
+
+    @staticmethod
+    def _parse_changes(
+        params: Optional[types.NotificationParams],
+    ) -> Optional[ResourceChanges]:
+        # mcp_server.py lists the added and removed URIs in _meta
+        meta = params.meta.model_dump() if params and params.meta else {}
+        if "added" not in meta and "removed" not in meta:
+            return None
+        return ResourceChanges(
+            added=list(meta.get("added") or []),
+            removed=list(meta.get("removed") or []),
+        )
+
+    def _notify_resources(self, changes: Optional[ResourceChanges]):
+        for listener in self._resource_listeners:
+            listener(changes)
+
+    def _clear_tool_cache(self):
+        if self.tool_cache is not None:
+            self.tool_cache.clear()
+
+    def _invalidate(self, kind: str):
+        setattr(self, f"_{kind}", None)
+        for listener in self._list_changed_listeners:
+            listener(kind)
+
+    def add_list_changed_listener(self, listener: Callable[[str], None]):
+        """Register a callback invoked with "tools", "prompts" or "resources"
+        whenever the matching cached listing is dropped."""
+        self._list_changed_listeners.append(listener)
+
+    def add_resource_listener(
+        self, listener: Callable[[Optional[ResourceChanges]], None]
+    ):
+        """Register a callback for the server's resource notifications. It gets
+        the changed URIs, or None when the server only said that the resource
+        list changed."""
+        self._resource_listeners.append(listener)
+
+    def refresh(self):
+        """Drop every cached listing so the next call re-fetches it."""
+        for kind in ("tools", "prompts", "resources"):
+            self._invalidate(kind)
+
+    async def _list_all(self, list_fn, field: str) -> list:
+        items = []
+        cursor = None
+        while True:
+            with tracer.span(f"{field}/list", self.name):
+                result = await list_fn(cursor=cursor)
+            items.extend(getattr(result, field))
+            cursor = result.nextCursor
+            if not cursor:
+                return items
+
     async def list_tools(self) -> list[types.Tool]:
-        result = await self.session().list_tools()
-        return result.tools
+        if self._tools is None:
+            self._tools = await self._list_all(self.session().list_tools, "tools")
+            self._tool_annotations = {
+                tool.name: tool.annotations for tool in self._tools
+            }
+        return self._tools
+
+    async def _is_read_only(self, tool_name: str) -> bool:
+        """Whether the server annotated the tool read-only; unannotated tools
+        are assumed to mutate. Idempotent ones still change state, so they
+        are neither cached nor run concurrently with edits."""
+        await self.list_tools()
+        annotations = self._tool_annotations.get(tool_name)
+        return annotations is not None and bool(annotations.readOnlyHint)
 
     async def call_tool(
-        self, tool_name: str, tool_input
+        self, tool_name: str, tool_input, progress_callback=None
     ) -> types.CallToolResult | None:
-        return await self.session().call_tool(tool_name, tool_input)
+        read_only = await self._is_read_only(tool_name)
+        cache = self.tool_cache
+        key = None
+        # A result computed across an invalidation is not stored
+        generation = cache.generation if cache is not None else None
+        if cache is not None and read_only:
+            key = (
+                tool_name,
+                json.dumps(
+                    tool_input or {},
+                    sort_keys=True,
+                    separators=(",", ":"),
+                    default=str,
+                ),
+            )
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
+        if read_only:
+            result = await self._send_tool_call(tool_name, tool_input, progress_callback)
+        else:
+            async with self._mutation_lock:
+                result = await self._send_tool_call(
+                    tool_name, tool_input, progress_callback
+                )
+
+        if not read_only:
+            self._clear_tool_cache()
+        if key is not None and not result.isError:
+            cache.put(key, result, _content_size(result.content), generation)
+        return result
+
+    async def _send_tool_call(
+        self, tool_name: str, tool_input, progress_callback
+    ) -> types.CallToolResult:
+        async with self._call_slots:
+            with tracer.span("tools/call", self.name, tool_name) as span:
+                result = await self.session().call_tool(
+                    tool_name, tool_input, progress_callback=progress_callback
+                )
+                span.payload_bytes = _content_size(result.content)
+                if result.isError:
+                    span.error = "tool returned an error"
+                return result
 
     async def list_prompts(self) -> list[types.Prompt]:
-        result = await self.session().list_prompts()
-        return result.prompts
+        if self._prompts is None:
+            self._prompts = await self._list_all(
+                self.session().list_prompts, "prompts"
+            )
+        return self._prompts
+
+    async def list_resources(self) -> list[types.Resource]:
+        if self._resources is None:
+            self._resources = await self._list_all(
+                self.session().list_resources, "resources"
+            )
+        return self._resources
 
     async def get_prompt(self, prompt_name, args: dict[str, str]):
-        result = await self.session().get_prompt(prompt_name, args)
+        with tracer.span("prompts/get", self.name, prompt_name):
+            result = await self.session().get_prompt(prompt_name, args)
         return result.messages
 
-    async def read_resource(self, uri: str) -> Any:
-        result = await self.session().read_resource(AnyUrl(uri))
+    async def read_resource(self, uri: str, use_cache: bool = True) -> Any:
+        cache = self.resource_cache if use_cache else None
+        if cache is not None:
+            cached = cache.get(uri, _MISSING)
+            if cached is not _MISSING:
+                return json.loads(cached) if isinstance(cached, _JSONText) else cached
+            # A notification arriving during the read makes its result stale
+            generation = cache.generation
+
+        with tracer.span("resources/read", self.name) as span:
+            span.attributes["uri"] = uri
+            result = await self.session().read_resource(AnyUrl(uri))
+            span.payload_bytes = _content_size(result.contents)
         resource = result.contents[0]
 
         if isinstance(resource, types.TextResourceContents):
             if resource.mimeType == "application/json":
-                return json.loads(resource.text)
+                text = _JSONText(resource.text)
+                value = json.loads(text)
+            else:
+                text = value = resource.text
 
-            return resource.text
+            if cache is not None:
+                cache.put(uri, text, len(resource.text.encode()), generation)
+            return value
 
     async def cleanup(self):
-        await self._exit_stack.aclose()
+        try:
+            await self._exit_stack.aclose()
+        except Exception as e:
+            # The server may still be sending notifications (e.g. ingestion
+            # progress) as the transport closes; those are lost anyway
+            if not _closed_stream_error(e):
+                raise
         self._session = None
+        self._tools = self._prompts = self._resources = None
+        self._clear_tool_cache()
 
     async def __aenter__(self):
-        await self.connect()
+        try:
+            await self.connect()
+        except BaseException:
+            await self.cleanup()
+            raise
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         await self.cleanup()
 
 
+class HTTPMCPClient(MCPClient):
+    """MCPClient for a long-lived server shared over HTTP, such as
+    ``MCP_TRANSPORT=streamable-http python mcp_server.py``.
+
+    URLs ending in /sse use the SSE transport, anything else streamable HTTP.
+    Requests of a session reuse the transport's keep-alive connections.
+    """
+
+    def __init__(self, url: str, headers: Optional[dict] = None, **kwargs):
+        kwargs.setdefault("name", url)
+        super().__init__(command="", args=[], **kwargs)
+        self.url = url
+        self._headers = headers
+
+    async def _open_transport(self):
+        if self.url.rstrip("/").endswith("/sse"):
+            return await self._exit_stack.enter_async_context(
+                sse_client(self.url, headers=self._headers)
+            )
+        read, write, _ = await self._exit_stack.enter_async_context(
+            streamablehttp_client(self.url, headers=self._headers)
+        )
+        return read, write
+
+
+class MCPClientGroup:
+    """Connects several MCPClients concurrently and keeps them open together.
+
+    Each client is entered and exited inside its own task, because the stdio
+    transport's task group must be closed by the task that opened it. A
+    server that fails to start is reported in ``errors`` and left out of
+    ``clients`` instead of aborting the others.
+    """
+
+    def __init__(
+        self,
+        clients: dict[str, MCPClient],
+        timeout: Optional[float] = None,
+    ):
+        self._pending = clients
+        self._timeout = timeout
+        self.clients: dict[str, MCPClient] = {}
+        self.errors: dict[str, BaseException] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._closing = asyncio.Event()
+
+    async def _hold(self, client: MCPClient, ready: asyncio.Future):
+        try:
+            async with client:
+                ready.set_result(client)
+                await self._closing.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                print(f"Error closing MCP client: {e}", file=sys.stderr)
+
+    async def __aenter__(self):
+        loop = asyncio.get_running_loop()
+        ready = {name: loop.create_future() for name in self._pending}
+        self._tasks = [
+            asyncio.create_task(self._hold(client, ready[name]))
+            for name, client in self._pending.items()
+        ]
+
+        await asyncio.wait(ready.values(), timeout=self._timeout)
+
+        for (name, client), task in zip(self._pending.items(), self._tasks):
+            future = ready[name]
+            if not future.done():
+                task.cancel()
+                future.cancel()
+                self.errors[name] = TimeoutError("timed out while connecting")
+            elif future.exception() is not None:
+                self.errors[name] = future.exception()
+            else:
+                self.clients[name] = client
+
+        for name, error in self.errors.items():
+            print(f"Failed to start MCP server '{name}': {error}", file=sys.stderr)
+
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._closing.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
 # For testing
 async def main():
     async with MCPClient(
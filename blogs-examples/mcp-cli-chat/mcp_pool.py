@@ -0,0 +1,266 @@
+import sys
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+import anyio
+from mcp import types
+from mcp.shared.exceptions import McpError
+
+from mcp_client import MCPClient, MCPClientGroup, ResourceChanges
+
+
+class _WatchedStream:
+    """Receive stream that sets ``closed`` once the server's stdout ends."""
+
+    def __init__(self, stream, closed: asyncio.Event):
+        self._stream = stream
+        self._closed = closed
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self._stream.__anext__()
+        except StopAsyncIteration:
+            self._closed.set()
+            raise
+
+    async def __aenter__(self):
+        await self._stream.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return await self._stream.__aexit__(*exc_info)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class _PoolWorker(MCPClient):
+    def __init__(self, slot: int, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.slot = slot
+        self.inflight = 0
+        self.disconnected = asyncio.Event()
+
+    async def _open_transport(self):
+        read, write = await super()._open_transport()
+        return _WatchedStream(read, self.disconnected), write
+
+
+class MCPClientPool:
+    """``size`` server processes for one command, used like a single MCPClient.
+
+    Read-only tool calls, resource reads and prompts go to the least busy
+    worker. Every other tool call goes to worker 0, the primary, so edits
+    are applied by one process in the order they were issued. The resource
+    and tool caches are shared by all workers, and the primary's
+    notifications invalidate them. A worker whose process exits is
+    restarted; the read-only call that hit it is retried once.
+
+    The workers only see each other's edits through a shared document store
+    (DOC_STORE=sqlite:///... or files:///...), not with the in-memory one.
+    """
+
+    def __init__(
+        self,
+        command: str,
+        args: list[str],
+        env: Optional[dict] = None,
+        size: int = 2,
+        name: Optional[str] = None,
+        timeout: Optional[float] = None,
+        **client_options,
+    ):
+        self.name = name or " ".join([command, *args])
+        self._command = command
+        self._args = args
+        self._env = env
+        self._options = client_options
+        self._timeout = timeout
+        self._listeners: list[Callable[[str], None]] = []
+        self._resource_listeners: list[
+            Callable[[Optional[ResourceChanges]], None]
+        ] = []
+        self._groups: dict[int, MCPClientGroup] = {}
+        self._replace_lock = asyncio.Lock()
+        self._next = 0
+
+        self._workers: list[_PoolWorker] = []
+        primary = self._new_worker(0)
+        self.resource_cache = primary.resource_cache
+        self.tool_cache = primary.tool_cache
+        # Appended one by one: _new_worker shares the caches once the
+        # primary is in the list
+        self._workers.append(primary)
+        for slot in range(1, size):
+            self._workers.append(self._new_worker(slot))
+
+    def _new_worker(self, slot: int) -> _PoolWorker:
+        worker = _PoolWorker(
+            slot,
+            self._command,
+            self._args,
+            self._env,
+            name=self.name,
+            **self._options,
+        )
+        if self._workers:
+            worker.resource_cache = self.resource_cache
+            worker.tool_cache = self.tool_cache
+        worker.add_list_changed_listener(
+            lambda kind: self._forward_list_changed(worker, kind)
+        )
+        worker.add_resource_listener(
+            lambda changes: self._forward_resource_changes(worker, changes)
+        )
+        return worker
+
+    def _forward_list_changed(self, worker: _PoolWorker, kind: str):
+        # Every worker gets the same notifications; pass on the primary's only
+        if self._workers[0] is worker:
+            for listener in self._listeners:
+                listener(kind)
+
+    def _forward_resource_changes(
+        self, worker: _PoolWorker, changes: Optional[ResourceChanges]
+    ):
+        if self._workers[0] is worker:
+            for listener in self._resource_listeners:
+                listener(changes)
+
+    @property
+    def primary(self) -> _PoolWorker:
+        return self._workers[0]
+
+    def session(self):
+        return self.primary.session()
+
+    def add_list_changed_listener(self, listener: Callable[[str], None]):
+        self._listeners.append(listener)
+
+    def add_resource_listener(
+        self, listener: Callable[[Optional[ResourceChanges]], None]
+    ):
+        self._resource_listeners.append(listener)
+
+    def refresh(self):
+        for worker in self._workers:
+            worker.refresh()
+
+    async def _start(self, worker: _PoolWorker):
+        label = f"{self.name}#{worker.slot}"
+        group = MCPClientGroup({label: worker}, timeout=self._timeout)
+        await group.__aenter__()
+        if label in group.errors:
+            await group.__aexit__(None, None, None)
+            raise group.errors[label]
+        self._groups[worker.slot] = group
+
+    async def _replace(self, worker: _PoolWorker) -> _PoolWorker:
+        async with self._replace_lock:
+            current = self._workers[worker.slot]
+            if current is not worker:
+                # Another request already restarted this slot
+                return current
+            print(
+                f"MCP server '{self.name}' worker {worker.slot} exited, restarting",
+                file=sys.stderr,
+            )
+            await self._groups.pop(worker.slot).__aexit__(None, None, None)
+            replacement = self._new_worker(worker.slot)
+            await self._start(replacement)
+            self._workers[worker.slot] = replacement
+            return replacement
+
+    def _least_loaded(self) -> _PoolWorker:
+        # Rotate the starting point so ties are spread round-robin
+        self._next = (self._next + 1) % len(self._workers)
+        order = self._workers[self._next :] + self._workers[: self._next]
+        return min(order, key=lambda worker: worker.inflight)
+
+    async def _dispatch(
+        self,
+        worker: _PoolWorker,
+        request: Callable[[_PoolWorker], Awaitable[Any]],
+        retry: bool,
+    ) -> Any:
+        if worker.disconnected.is_set():
+            worker = await self._replace(worker)
+        worker.inflight += 1
+        try:
+            return await request(worker)
+        except (McpError, anyio.ClosedResourceError, anyio.BrokenResourceError) as e:
+            crashed = worker.disconnected.is_set() or (
+                isinstance(e, McpError) and e.error.code == types.CONNECTION_CLOSED
+            )
+            if not crashed:
+                raise
+            worker.disconnected.set()
+        finally:
+            worker.inflight -= 1
+
+        worker = await self._replace(worker)
+        if not retry:
+            # A mutating call may have been applied before the crash
+            raise ConnectionError(
+                f"MCP server '{self.name}' exited during the request"
+            )
+        worker.inflight += 1
+        try:
+            return await request(worker)
+        finally:
+            worker.inflight -= 1
+
+    async def list_tools(self) -> list[types.Tool]:
+        return await self._dispatch(self.primary, lambda w: w.list_tools(), True)
+
+    async def list_prompts(self) -> list[types.Prompt]:
+        return await self._dispatch(self.primary, lambda w: w.list_prompts(), True)
+
+    async def list_resources(self) -> list[types.Resource]:
+        return await self._dispatch(self.primary, lambda w: w.list_resources(), True)
+
+    async def call_tool(
+        self, tool_name: str, tool_input, progress_callback=None
+    ) -> types.CallToolResult | None:
+        read_only = await self.primary._is_read_only(tool_name)
+        worker = self._least_loaded() if read_only else self.primary
+        return await self._dispatch(
+            worker,
+            lambda w: w.call_tool(tool_name, tool_input, progress_callback),
+            retry=read_only,
+        )
+
+    async def get_prompt(self, prompt_name, args: dict[str, str]):
+        return await self._dispatch(
+            self._least_loaded(), lambda w: w.get_prompt(prompt_name, args), True
+        )
+
+    async def read_resource(self, uri: str, use_cache: bool = True) -> Any:
+        return await self._dispatch(
+            self._least_loaded(), lambda w: w.read_resource(uri, use_cache), True
+        )
+
+    async def __aenter__(self):
+        results = await asyncio.gather(
+            *(self._start(worker) for worker in self._workers),
+            return_exceptions=True,
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            await self.cleanup()
+            raise errors[0]
+        return self
+
+    async def cleanup(self):
+        groups = list(self._groups.values())
+        self._groups.clear()
+        await asyncio.gather(
+            *(group.__aexit__(None, None, None) for group in groups),
+            return_exceptions=True,
+        )
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.cleanup()
@@ -1,9 +1,105 @@
-from mcp.server.fastmcp import FastMCP
+import asyncio
+import functools
+import os
+import sys
+import weakref
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Iterable, Literal, Optional
+from urllib.parse import parse_qs, unquote
 
-mcp = FastMCP("DocumentMCP", log_level="ERROR")
+from dotenv import load_dotenv
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.server.fastmcp.prompts import base
+from mcp.server.session import ServerSession
+from mcp.types import (
+    NotificationParams,
+    ResourceListChangedNotification,
+    ServerNotification,
+    ToolAnnotations,
+)
+from pydantic import AnyUrl, Field
+
+from doc_store import open_store
+from edit_engine import DocumentEdit, apply_edits
+from ingest import ParsedTextCache, file_hash, is_plain_text, parse_file, plan
+from tool_executor import ToolExecutor
+
+load_dotenv()
+
+# Seconds between checks for documents that other processes sharing the
+# store added, removed or rewrote; 0 turns the check off
+WATCH_INTERVAL = float(os.getenv("DOC_WATCH_INTERVAL", "2"))
+# Larger changes are announced without the list of ids, so clients relist
+MAX_DELTA_IDS = 1000
+
+# DOC_SOURCE_DIR=/path/to/folder loads the .md, .txt, .docx and .pdf files
+# in it into the store in the background; their extracted text is cached in
+# INGEST_CACHE (by default a dotfile in that folder) so they're parsed once
+SOURCE_DIR = os.getenv("DOC_SOURCE_DIR")
+INGEST_CACHE = os.getenv("INGEST_CACHE") or os.path.join(
+    SOURCE_DIR or ".", ".ingest-cache.db"
+)
+INGEST_BATCH = 64
+
+
+
+def _can_ingest() -> bool:
+    """Whether SOURCE_DIR is set and can be ingested; if it can't, the store
+    keeps the sample documents instead of starting out empty."""
+    if not SOURCE_DIR:
+        return False
+    cache_dir = os.path.dirname(os.path.abspath(INGEST_CACHE))
+    if not os.path.isdir(SOURCE_DIR):
+        problem = "it is not a directory"
+    elif not os.access(cache_dir, os.W_OK):
+        problem = f"{cache_dir} is not writable (set INGEST_CACHE)"
+    else:
+        return True
+    print(f"Not ingesting DOC_SOURCE_DIR={SOURCE_DIR}: {problem}", file=sys.stderr)
+    return False
+
+
+INGESTING = _can_ingest()
+
+_watcher: Optional[asyncio.Task] = None
+_ingester: Optional[asyncio.Task] = None
+
+
+def _start_background_tasks():
+    """Starts the store watcher and the ingestion of SOURCE_DIR on the running
+    loop, unless they are already running; one of each serves all sessions."""
+    global _watcher, _ingester
+    if WATCH_INTERVAL > 0 and docs.version() is not None:
+        if _watcher is None or _watcher.done():
+            _watcher = asyncio.create_task(_watch_docs())
+    if INGESTING and _ingester is None:
+        _ingester = asyncio.create_task(_ingest(SOURCE_DIR))
+
+
+@asynccontextmanager
+async def lifespan(server: FastMCP):
+    # Entered once per session. Run as a script the tasks start with the
+    # server, in _serve; this covers hosts that import mcp and run it
+    _start_background_tasks()
+    yield
+
+
+# MCP_TRANSPORT=streamable-http (or sse) runs one long-lived server that
+# several CLIs share, at http://MCP_HOST:MCP_PORT/mcp (or /sse)
+mcp = FastMCP(
+    "DocumentMCP",
+    log_level="ERROR",
+    host=os.getenv("MCP_HOST", "127.0.0.1"),
+    port=int(os.getenv("MCP_PORT", "8000")),
+    lifespan=lifespan,
+)
 
+# Lets clients cache results of the read tools until an edit comes in
+READ_ONLY = ToolAnnotations(readOnlyHint=True, idempotentHint=True)
+MUTATING = ToolAnnotations(readOnlyHint=False, destructiveHint=True, idempotentHint=False)
 
-docs = {
+
+sample_docs = {
     "deposition.md": "This deposition covers the testimony of Angela Smith, P.E.",
     "report.pdf": "The report details the state of a 20m condenser tower.",
     "financials.docx": "These financials outline the project's budget and expenditures.",
@@ -12,12 +108,166 @@ docs = {
     "spec.txt": "These specifications define the technical requirements for the equipment.",
 }
 
+# DOC_STORE=sqlite:///docs.db keeps edits across restarts; defaults to memory.
+# The samples are left out when real documents are ingested.
+docs = open_store(os.getenv("DOC_STORE"), seed={} if INGESTING else sample_docs)
 
-from pydantic import Field
-from mcp.server.fastmcp.prompts import base
+# Tool handlers run on these pools so one heavy call doesn't hold up the
+# session; unset sizes use Python's defaults
+executor = ToolExecutor(
+    thread_workers=int(os.getenv("TOOL_THREADS", "0")) or None,
+    process_workers=int(os.getenv("TOOL_PROCESSES", "0")) or None,
+)
+# Edits of documents at least this large are applied in a worker process
+CPU_OFFLOAD_CHARS = 256 * 1024
+# Store writes run on the tool threads one at a time, and edits of the same
+# document one after another, so none of them is lost
+_write_lock = asyncio.Lock()
+_edit_locks: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+
+# Sessions that have read documents; over HTTP there can be many, and all of
+# them have to hear about an edit to drop their cached copies
+_sessions: weakref.WeakSet = weakref.WeakSet()
+
+
+def _remember_session():
+    _sessions.add(mcp.get_context().session)
+
+
+async def _broadcast(
+    send: Callable[[ServerSession], Awaitable[None]],
+    sessions: Optional[set] = None,
+):
+    for session in sessions or set(_sessions):
+        try:
+            await send(session)
+        except Exception:
+            # The client went away
+            _sessions.discard(session)
+
+
+def _doc_uri(doc_id: str) -> str:
+    return f"docs://documents/{doc_id}"
+
+
+async def _watch_docs():
+    version, token = await executor.run_io(
+        lambda: (docs.version(), docs.change_token())
+    )
+    while True:
+        await asyncio.sleep(WATCH_INTERVAL)
+        try:
+            # Read the version first so a change made during the read is seen
+            # next time
+            latest = await executor.run_io(docs.version)
+            if latest == version:
+                continue
+            changes = await executor.run_io(docs.changes_since, token)
+            if changes is None:
+                token = await executor.run_io(docs.change_token)
+        except Exception:
+            # E.g. the store is locked by a writer; try again next time
+            continue
+        version = latest
+        if changes is None:
+            await _announce_list_changed([], [], relist=True)
+            continue
+        token = changes.token
+        await _announce_list_changed(changes.added, changes.removed)
+        await _announce_updated(changes.updated)
+
+
+async def _announce_list_changed(
+    added: list[str], removed: list[str], relist: bool = False
+):
+    """``relist`` announces a change without saying what changed."""
+    if not added and not removed and not relist:
+        return
+    # The changed URIs ride along in _meta, so clients patch their listings
+    # instead of fetching them again
+    meta = None
+    if not relist and len(added) + len(removed) <= MAX_DELTA_IDS:
+        meta = {
+            "added": [_doc_uri(doc_id) for doc_id in added],
+            "removed": [_doc_uri(doc_id) for doc_id in removed],
+        }
+    notification = ServerNotification(
+        ResourceListChangedNotification(
+            params=NotificationParams.model_validate({"_meta": meta})
+        )
+    )
+    await _broadcast(lambda session: session.send_notification(notification))
+
+
+async def _announce_updated(doc_ids: Iterable[str]):
+    # Lets clients drop their cached copies of these documents
+    for doc_id in doc_ids:
+        uri = AnyUrl(_doc_uri(doc_id))
+        await _broadcast(lambda session: session.send_resource_updated(uri))
+
+
+async def _ingest(directory: str):
+    # Nothing awaits this task, so its errors are reported here
+    try:
+        await _ingest_files(directory)
+    except Exception as e:
+        print(f"Ingesting {directory} failed: {e!r}", file=sys.stderr)
 
 
-@mcp.tool()
+async def _ingest_files(directory: str):
+    cache = await executor.run_io(ParsedTextCache, INGEST_CACHE)
+    try:
+        # Texts already in the cache are stored first, without reading a file
+        cached, stale = await executor.run_io(plan, directory, cache, docs)
+        for start in range(0, len(cached), MAX_DELTA_IDS):
+            await _store_ingested(cached[start : start + MAX_DELTA_IDS])
+
+        async def read(source):
+            try:
+                text = None
+                if source.parsed_before:
+                    # A touched but unchanged file is found by its hash
+                    digest = await executor.run_io(file_hash, source.path)
+                    text = await executor.run_io(cache.text, digest)
+                if text is None:
+                    run = (
+                        executor.run_io
+                        if is_plain_text(source.path)
+                        else executor.run_cpu
+                    )
+                    digest, text = await run(parse_file, source.path)
+                await executor.run_io(cache.put, source, digest, text)
+                return source.doc_id, text
+            except Exception as e:
+                print(f"Could not ingest {source.path}: {e}", file=sys.stderr)
+                return None
+
+        # Each batch is parsed in parallel and stored as soon as it is done
+        for start in range(0, len(stale), INGEST_BATCH):
+            results = await asyncio.gather(
+                *(read(source) for source in stale[start : start + INGEST_BATCH])
+            )
+            await _store_ingested([result for result in results if result])
+    finally:
+        cache.close()
+
+
+async def _store_ingested(batch: list[tuple[str, str]]):
+    def write() -> list[str]:
+        added = [doc_id for doc_id, _ in batch if doc_id not in docs]
+        docs.put_many(batch)
+        return added
+
+    if not batch:
+        return
+    async with _write_lock:
+        added = await executor.run_io(write)
+    await _announce_list_changed(added, [])
+    # Re-parsed files replace what clients may have cached
+    await _announce_updated({doc_id for doc_id, _ in batch} - set(added))
+
+
+@mcp.tool(annotations=READ_ONLY)
 def help():
     """Lists all available commands and their descriptions."""
     tool_list = []
@@ -28,22 +278,74 @@ def help():
 
 @mcp.tool(
     name="read_doc_contents",
+    annotations=READ_ONLY,
     description="Read the contents of a document and return it as a string.",
 )
+@executor.handler("read_doc_contents", timeout=30)
 def read_document(
     doc_id: str = Field(description="Id of the document to read"),
 ):
-    if doc_id not in docs:
+    _remember_session()
+    content = docs.get(doc_id)
+    if content is None:
+        raise ValueError(f"Doc with id {doc_id} not found")
+
+    return content
+
+
+@mcp.tool(
+    name="read_doc_range",
+    annotations=READ_ONLY,
+    description=(
+        "Read part of a document: `length` lines (or bytes) starting at the "
+        "0-based `offset`. Use this instead of read_doc_contents for large documents."
+    ),
+)
+@executor.handler(timeout=30)
+def read_doc_range(
+    doc_id: str = Field(description="Id of the document to read"),
+    offset: int = Field(default=0, description="0-based first line (or byte) to read"),
+    length: Optional[int] = Field(
+        default=None, description="Number of lines (or bytes) to read, all if omitted"
+    ),
+    unit: Literal["lines", "bytes"] = Field(
+        default="lines", description="Whether offset and length count lines or bytes"
+    ),
+):
+    _remember_session()
+    content = docs.read_range(doc_id, offset, length, unit)
+    if content is None:
         raise ValueError(f"Doc with id {doc_id} not found")
 
-    return docs[doc_id]
+    return content
+
+
+@mcp.tool(
+    name="search_docs",
+    annotations=READ_ONLY,
+    description=(
+        "Full-text search over all documents. Returns the best matching doc ids, "
+        "ranked, with a short snippet of each. Use it to find relevant documents "
+        "before reading them."
+    ),
+)
+@executor.handler(max_concurrency=4, timeout=30)
+def search_docs(
+    query: str = Field(description="Words to search for"),
+    limit: int = Field(default=10, description="Maximum number of results"),
+) -> dict:
+    _remember_session()
+    return {"results": docs.search(query, limit)}
 
 
 @mcp.tool(
     name="edit_document",
+    annotations=MUTATING,
     description="Edit a document by replacing a string in the documents content with a new string",
 )
-def edit_document(
+@executor.handler(max_concurrency=4)
+async def edit_document(
+    ctx: Context,
     doc_id: str = Field(description="Id of the document that will be edited"),
     old_str: str = Field(
         description="The text to replace. Must match exactly, including whitespace"
@@ -52,22 +354,119 @@ def edit_document(
         description="The new text to insert in place of the old text"
     ),
 ):
-    if doc_id not in docs:
-        raise ValueError(f"Doc with id {doc_id} not found")
+    counts = await _apply_edits(
+        ctx, doc_id, [DocumentEdit(old_str=old_str, new_str=new_str)]
+    )
+    return f"Replaced {counts[0]} occurrence(s)"
+
+
+@mcp.tool(
+    name="edit_document_batch",
+    annotations=MUTATING,
+    description=(
+        "Apply an ordered list of replacements to a document in one call. Each edit "
+        "sees the result of the previous ones. If any edit matches nothing (or not "
+        "its expected_matches count) no change is made. Returns the match count per edit."
+    ),
+)
+@executor.handler(max_concurrency=4)
+async def edit_document_batch(
+    ctx: Context,
+    doc_id: str = Field(description="Id of the document that will be edited"),
+    edits: list[DocumentEdit] = Field(description="Replacements to apply, in order"),
+) -> dict:
+    counts = await _apply_edits(ctx, doc_id, edits)
+    return {"doc_id": doc_id, "matches": counts}
 
-    docs[doc_id] = docs[doc_id].replace(old_str, new_str)
 
+async def _apply_edits(
+    ctx: Context, doc_id: str, edits: list[DocumentEdit]
+) -> list[int]:
+    async with _edit_locks.setdefault(doc_id, asyncio.Lock()):
+        content = await executor.run_io(docs.get, doc_id)
+        if content is None:
+            raise ValueError(f"Doc with id {doc_id} not found")
 
+        if len(content) >= CPU_OFFLOAD_CHARS:
+            new_content, counts = await executor.run_cpu(apply_edits, content, edits)
+        else:
+            new_content, counts = apply_edits(content, edits)
+        async with _write_lock:
+            await executor.run_io(docs.put, doc_id, new_content)
+    # Lets clients drop their cached copy of this document
+    uri = AnyUrl(_doc_uri(doc_id))
+    await _broadcast(
+        lambda session: session.send_resource_updated(uri),
+        {ctx.session, *_sessions},
+    )
+    return counts
+
+
+# Resources read the store on the tool threads too, off the event loop
 @mcp.resource("docs://documents", mime_type="application/json")
-def list_docs() -> list[str]:
-    return list(docs.keys())
+async def list_docs() -> list[str]:
+    _remember_session()
+    return await executor.run_io(lambda: list(docs.ids()))
+
+
+@mcp.resource("docs://documents/page/{params}", mime_type="application/json")
+async def list_docs_page(params: str) -> dict:
+    """One page of doc ids in sorted order. ``params`` is a URL-encoded query
+    string: limit (default and maximum 1000), prefix, glob, and the cursor
+    returned as nextCursor by the previous page."""
+    _remember_session()
+    query = {key: values[-1] for key, values in parse_qs(params).items()}
+    limit = min(max(int(query.get("limit", 1000)), 1), 1000)
+    ids = await executor.run_io(
+        functools.partial(
+            docs.list_ids,
+            prefix=query.get("prefix", ""),
+            glob=query.get("glob") or None,
+            after=query.get("cursor") or None,
+            limit=limit + 1,
+        )
+    )
+    # The cursor is simply the last id of the page
+    next_cursor = ids[limit - 1] if len(ids) > limit else None
+    return {"ids": ids[:limit], "nextCursor": next_cursor}
 
 
 @mcp.resource("docs://documents/{doc_id}", mime_type="text/plain")
-def fetch_doc(doc_id: str) -> str:
-    if doc_id not in docs:
+async def fetch_doc(doc_id: str) -> str:
+    # docs://documents/{doc_id}?offset=&length=&unit= serves a slice; the query
+    # ends up in doc_id because URI templates do not parse query strings
+    _remember_session()
+    doc_id, _, query = doc_id.partition("?")
+    if query:
+        params = {key: values[-1] for key, values in parse_qs(query).items()}
+        length = params.get("length")
+        content = await executor.run_io(
+            docs.read_range,
+            doc_id,
+            int(params.get("offset", 0)),
+            int(length) if length else None,
+            params.get("unit", "bytes"),
+        )
+    else:
+        content = await executor.run_io(docs.get, doc_id)
+    if content is None:
         raise ValueError(f"Doc with id {doc_id} not found")
-    return docs[doc_id]
+    return content
+
+
+@mcp.resource("docs://documents/batch/{ids}", mime_type="application/json")
+async def fetch_docs_batch(ids: str) -> dict[str, str]:
+    """Comma-separated, URL-quoted doc ids; unknown ids are left out."""
+    _remember_session()
+    doc_ids = [unquote(doc_id) for doc_id in ids.split(",")]
+
+    def read() -> dict[str, str]:
+        contents = {doc_id: docs.get(doc_id) for doc_id in doc_ids}
+        return {
+            doc_id: content for doc_id, content in contents.items() if content is not None
+        }
+
+    return await executor.run_io(read)
 
 
 @mcp.prompt(
@@ -108,6 +507,20 @@ def summarize_document(
     return [base.UserMessage(prompt)]
 
 
+async def _serve(transport: str):
+    # Over HTTP the first session may come much later than the server start
+    _start_background_tasks()
+    match transport:
+        case "stdio":
+            await mcp.run_stdio_async()
+        case "sse":
+            await mcp.run_sse_async()
+        case "streamable-http":
+            await mcp.run_streamable_http_async()
+        case _:
+            raise ValueError(f"Unknown transport: {transport}")
+
+
 if __name__ == "__main__":
-    mcp.run(transport="stdio")
+    asyncio.run(_serve(os.getenv("MCP_TRANSPORT", "stdio")))
 
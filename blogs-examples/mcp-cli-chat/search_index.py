@@ -0,0 +1,104 @@
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+from typing import Optional
+
+TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN.findall(text.lower())
+
+
+def make_snippet(content: str, terms: set[str], width: int = 80) -> str:
+    """A ``width``-character window around the first occurrence of any term."""
+    for match in TOKEN.finditer(content):
+        if match.group().lower() in terms:
+            start = max(0, match.start() - width // 2)
+            end = min(len(content), start + width)
+            prefix = "…" if start > 0 else ""
+            suffix = "…" if end < len(content) else ""
+            return prefix + content[start:end].replace("\n", " ") + suffix
+    return content[:width].replace("\n", " ")
+
+
+class InvertedIndex:
+    """In-memory term -> postings index ranked with BM25.
+
+    Documents are (re)indexed one at a time, so an edit only touches the
+    postings of the edited document. Searches run on the server's tool
+    threads, so every access takes a lock.
+    """
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self.postings: dict[str, dict[str, int]] = {}
+        # Only the distinct terms are kept per document, to unlink its postings
+        self.doc_terms: dict[str, tuple[str, ...]] = {}
+        self.doc_lengths: dict[str, int] = {}
+        self.total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.doc_terms)
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            terms = self.doc_terms.pop(doc_id, None)
+            if terms is None:
+                return
+            self.total_length -= self.doc_lengths.pop(doc_id)
+            for term in terms:
+                postings = self.postings[term]
+                del postings[doc_id]
+                if not postings:
+                    del self.postings[term]
+
+    def add(self, doc_id: str, content: str):
+        # Tokenized before taking the lock, which then covers only the updates
+        terms = Counter(tokenize(content))
+        with self._lock:
+            self.remove(doc_id)
+            self.doc_terms[doc_id] = tuple(terms)
+            self.doc_lengths[doc_id] = sum(terms.values())
+            self.total_length += self.doc_lengths[doc_id]
+            for term, count in terms.items():
+                self.postings.setdefault(term, {})[doc_id] = count
+
+    def search(self, query: str, limit: int = 10) -> list[tuple[str, float]]:
+        terms = set(tokenize(query))
+        with self._lock:
+            return self._search(terms, limit)
+
+    def _search(self, terms: set[str], limit: int) -> list[tuple[str, float]]:
+        if not terms or not self.doc_terms:
+            return []
+
+        n = len(self.doc_terms)
+        avg_length = self.total_length / n
+        scores: dict[str, float] = {}
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                length = self.doc_lengths[doc_id]
+                norm = tf + self.k1 * (1 - self.b + self.b * length / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+
+        return heapq.nsmallest(
+            limit, scores.items(), key=lambda item: (-item[1], item[0])
+        )
+
+
+def fts5_query(query: str) -> Optional[str]:
+    """Quote each token so user input can never be parsed as FTS5 syntax."""
+    tokens = tokenize(query)
+    if not tokens:
+        return None
+    return " OR ".join(f'"{token}"' for token in tokens)
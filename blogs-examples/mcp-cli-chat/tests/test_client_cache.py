@@ -0,0 +1,112 @@
+import asyncio
+import sys
+
+import anyio
+import pytest
+from mcp import types
+
+from mcp_client import MCPClient
+
+if sys.version_info < (3, 11):
+    from exceptiongroup import ExceptionGroup
+
+DOC = "docs://documents/plan.md"
+LISTING = "docs://documents"
+
+
+def list_changed(added=(), removed=()):
+    meta = {"added": list(added), "removed": list(removed)}
+    return types.ServerNotification(
+        types.ResourceListChangedNotification(
+            params=types.NotificationParams.model_validate({"_meta": meta})
+        )
+    )
+
+
+def updated(uri):
+    return types.ServerNotification(
+        types.ResourceUpdatedNotification(
+            params=types.ResourceUpdatedNotificationParams(uri=uri)
+        )
+    )
+
+
+class FakeSession:
+    """Answers resource reads, optionally running ``during`` mid-read."""
+
+    def __init__(self, contents: dict[str, tuple[str, str]]):
+        self.contents = contents
+        self.during = None
+
+    async def read_resource(self, uri):
+        text, mime_type = self.contents[str(uri)]
+        if self.during is not None:
+            during, self.during = self.during, None
+            await during()
+        return types.ReadResourceResult(
+            contents=[
+                types.TextResourceContents(uri=uri, text=text, mimeType=mime_type)
+            ]
+        )
+
+
+def make_client():
+    client = MCPClient(sys.executable, [], resource_cache_bytes=1 << 20)
+    client._session = FakeSession(
+        {
+            DOC: ("old content", "text/plain"),
+            LISTING: ('["plan.md"]', "application/json"),
+        }
+    )
+    return client
+
+
+def test_added_document_drops_cached_listings_but_not_documents():
+    async def run():
+        client = make_client()
+        await client.read_resource(DOC)
+        assert await client.read_resource(LISTING) == ["plan.md"]
+        client._session.contents[LISTING] = ('["new.md", "plan.md"]', "application/json")
+
+        await client._handle_message(list_changed(added=["docs://documents/new.md"]))
+        assert DOC in client.resource_cache
+        assert await client.read_resource(LISTING) == ["new.md", "plan.md"]
+
+    asyncio.run(run())
+
+
+def test_update_during_a_read_keeps_its_result_out_of_the_cache():
+    async def run():
+        client = make_client()
+
+        async def edit():
+            client._session.contents[DOC] = ("new content", "text/plain")
+            await client._handle_message(updated(DOC))
+
+        client._session.during = edit
+        assert await client.read_resource(DOC) == "old content"
+        assert DOC not in client.resource_cache
+        assert await client.read_resource(DOC) == "new content"
+
+    asyncio.run(run())
+
+
+def test_cleanup_tolerates_notifications_during_shutdown():
+    async def run():
+        client = make_client()
+
+        async def late_notification():
+            raise ExceptionGroup("reader", [anyio.BrokenResourceError()])
+
+        client._exit_stack.push_async_callback(late_notification)
+        await client.cleanup()
+        assert client._session is None
+
+        async def real_error():
+            raise ExceptionGroup("reader", [anyio.BrokenResourceError(), OSError()])
+
+        client._exit_stack.push_async_callback(real_error)
+        with pytest.raises(ExceptionGroup):
+            await client.cleanup()
+
+    asyncio.run(run())
@@ -0,0 +1,37 @@
+from core.completion import CompletionIndex
+
+
+def test_prefix_matches_come_without_fuzzy_ones():
+    index = CompletionIndex(["plan.md", "Plans.txt", "report.pdf", "my-plan.md"])
+    assert index.search("pla") == ["plan.md", "Plans.txt"]
+
+
+def test_fuzzy_matches_only_when_no_prefix_matches():
+    index = CompletionIndex(["plan.md", "my-plan.md", "outline.md"])
+    assert index.search("mpln") == ["my-plan.md"]
+    assert index.search("pn") == ["plan.md", "my-plan.md"]
+
+
+def test_fuzzy_pass_is_bounded(monkeypatch):
+    monkeypatch.setattr(CompletionIndex, "FUZZY_WINDOW", 3)
+    index = CompletionIndex([f"a{i}b.md" for i in range(10)] + ["bx.md"])
+    # Starts at "b" and wraps round to the first two "a" ids
+    assert sorted(index.search("bmd")) == ["a0b.md", "a1b.md", "bx.md"]
+
+
+def test_update_applies_the_difference():
+    index = CompletionIndex(["a", "b", "c"])
+    index.update(["b", "c", "d"])
+    assert sorted(index.search("")) == ["b", "c", "d"]
+    assert "a" not in index and len(index) == 3
+
+
+def test_replace_prefix_drops_ids_the_server_no_longer_has():
+    index = CompletionIndex(["Plan.md", "plan-a.md", "plan-b.md", "plan-z.md", "x.md"])
+    # A full page covers ids only up to its last one
+    assert index.replace_prefix("plan", ["plan-c.md"], last="plan-c.md")
+    assert sorted(index.search("")) == ["Plan.md", "plan-c.md", "plan-z.md", "x.md"]
+    # A short page covers the whole, case-sensitive, prefix
+    assert index.replace_prefix("plan", [])
+    assert sorted(index.search("")) == ["Plan.md", "x.md"]
+    assert not index.replace_prefix("plan", [])
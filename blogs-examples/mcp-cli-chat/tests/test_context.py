@@ -0,0 +1,47 @@
+from core.context import ContextBuilder, MentionedDocument, estimate_tokens
+
+
+def paragraphs(*texts: str) -> str:
+    return "\n\n".join(texts)
+
+
+def test_small_documents_are_included_whole():
+    doc = MentionedDocument("a.md", "short text")
+    context, stats = ContextBuilder(budget_tokens=1000).build("query", [doc])
+    assert context == doc.render(doc.content)
+    assert stats.saved_tokens == 0
+
+
+def test_context_stays_within_budget():
+    filler = "lorem ipsum dolor sit amet " * 40
+    docs = [
+        MentionedDocument(f"{n}.md", paragraphs(*[filler] * 10)) for n in range(3)
+    ]
+    builder = ContextBuilder(budget_tokens=800, chunk_chars=400)
+    context, stats = builder.build("lorem", docs)
+    assert estimate_tokens(context) <= 800
+    assert stats.used_tokens == estimate_tokens(context)
+    assert stats.original_tokens > 800 and stats.saved_tokens > 0
+    # Every document keeps its tag
+    assert all(f'id="{n}.md"' in context for n in range(3))
+
+
+def test_most_relevant_chunk_is_kept():
+    filler = "nothing to see in this paragraph at all " * 8
+    relevant = "the condenser tower pressure readings are listed here " * 6
+    doc = MentionedDocument(
+        "report.md", paragraphs(filler, filler, relevant, filler, filler)
+    )
+    builder = ContextBuilder(budget_tokens=120, chunk_chars=400)
+    context, _ = builder.build("What were the condenser tower pressure readings?", [doc])
+    assert relevant in context
+    assert filler not in context
+    # Cut chunks are marked on both sides of the kept one
+    assert context.count("[…]") == 2
+
+
+def test_long_paragraphs_are_split():
+    doc = MentionedDocument("big.md", "x" * 5000)
+    context, _ = ContextBuilder(budget_tokens=400, chunk_chars=1000).build("x", [doc])
+    assert estimate_tokens(context) <= 400
+    assert "x" * 1000 in context
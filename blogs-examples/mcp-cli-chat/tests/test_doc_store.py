@@ -0,0 +1,123 @@
+import functools
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from doc_store import FileDocumentStore, MemoryDocumentStore, SQLiteDocumentStore
+
+
+def test_changes_since_reports_only_other_writers(tmp_path):
+    path = str(tmp_path / "docs.db")
+    watcher, writer = SQLiteDocumentStore(path), SQLiteDocumentStore(path)
+    watcher.put("own.md", "written by the watcher's process")
+    writer.put_many([("a.md", "a"), ("b.md", "b")])
+    token = watcher.change_token()
+
+    writer.put("a.md", "a, edited")
+    writer.put("b.md", "b")  # unchanged content is not a change
+    writer.put("c.md", "c")
+    writer.put("d.md", "d")
+    watcher.put("own.md", "edited by the watcher's process")
+    with sqlite3.connect(path) as conn:
+        conn.execute("DELETE FROM documents WHERE id IN ('b.md', 'd.md')")
+
+    changes = watcher.changes_since(token)
+    assert (changes.added, changes.removed, changes.updated) == (
+        ["c.md"],
+        ["b.md"],
+        ["a.md"],
+    )
+    assert watcher.changes_since(changes.token).added == []
+
+
+def test_changes_since_gives_up_once_the_log_is_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr(SQLiteDocumentStore, "CHANGE_LOG_ROWS", 2)
+    path = str(tmp_path / "docs.db")
+    watcher, writer = SQLiteDocumentStore(path), SQLiteDocumentStore(path)
+    token = watcher.change_token()
+    for i in range(5):
+        writer.put(f"{i}.md", str(i))
+    assert watcher.changes_since(token) is None
+    assert watcher.changes_since(watcher.change_token()).added == []
+
+
+def test_store_can_be_shared_by_threads(tmp_path):
+    store = SQLiteDocumentStore(str(tmp_path / "docs.db"))
+    store.put_many((f"{i}.md", f"document {i}") for i in range(200))
+
+    def work(n):
+        for i in range(200):
+            store.put(f"{n}-{i}.md", f"written by {n}")
+            assert store.get(f"{i}.md") == f"document {i}"
+            assert len(store.list_ids(prefix="1", limit=5)) == 5
+            if i % 50 == 0:
+                assert sum(1 for _ in store.ids()) >= 200
+                store.search("document")
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(work, range(8)))
+    assert len(list(store.ids())) == 200 + 8 * 200
+
+
+def test_new_store_opened_by_many_connections_at_once(tmp_path):
+    def open_and_search(args):
+        path, n = args
+        store = SQLiteDocumentStore(path)
+        store.put(f"{n}.md", "hello world")
+        return store.has_fts and bool(store.search("hello"))
+
+    with ThreadPoolExecutor(8) as pool:
+        for trial in range(10):
+            path = str(tmp_path / f"{trial}.db")
+            assert all(pool.map(open_and_search, [(path, n) for n in range(8)]))
+
+
+def test_file_store_changes_leave_out_its_own_writes(tmp_path):
+    store = FileDocumentStore(str(tmp_path))
+    token = store.change_token()
+    store.put("own.md", "written here")
+    (tmp_path / "other.md").write_text("written by another process")
+    changes = store.changes_since(token)
+    assert (changes.added, changes.removed) == (["other.md"], [])
+
+
+def test_locked_store_is_an_error_not_a_store_without_fts(tmp_path, monkeypatch):
+    path = str(tmp_path / "docs.db")
+    SQLiteDocumentStore(path).close()
+    monkeypatch.setattr(sqlite3, "connect", functools.partial(sqlite3.connect, timeout=0.1))
+    writer = sqlite3.connect(path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            SQLiteDocumentStore(path)
+    finally:
+        writer.rollback()
+
+
+class SlowMemoryStore(MemoryDocumentStore):
+    def get(self, doc_id):
+        time.sleep(0.001)
+        return super().get(doc_id)
+
+
+def test_concurrent_first_searches_see_the_whole_index():
+    docs = {f"{i:03}.md": "filler text" for i in range(100)}
+    docs["999.md"] = "the needle"
+    store = SlowMemoryStore(docs)
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda _: store.search("needle"), range(4)))
+    assert all([r["doc_id"] for r in result] == ["999.md"] for result in results)
+
+
+def test_put_during_the_index_build_is_not_lost():
+    store = SlowMemoryStore({f"{i:03}.md": "filler text" for i in range(100)})
+    building = threading.Thread(target=store.search, args=("filler",))
+    building.start()
+    time.sleep(0.02)
+    store.put("000.md", "rewritten while indexing")
+    building.join()
+    assert [r["doc_id"] for r in store.search("rewritten")] == ["000.md"]
+    assert "000.md" not in [r["doc_id"] for r in store.search("filler", 200)]
@@ -0,0 +1,87 @@
+import random
+
+import pytest
+
+from edit_engine import MAX_PIECES, DocumentEdit, EditError, PieceTable, apply_edits
+
+
+def split_table(*parts: str) -> PieceTable:
+    """A table whose pieces are ``parts``, in separate buffers."""
+    table = PieceTable("|".join(parts))
+    table.replace_all("|", "")
+    assert len(table._pieces) == len(parts)
+    return table
+
+
+def test_matches_straddling_pieces():
+    table = split_table("ab", "cd", "ef")
+    assert table.text() == "abcdef"
+    assert table.find_all("bcde") == [1]
+    assert table.find_all("abcdef") == [0]
+    assert table.replace_all("cde", "X") == 1
+    assert table.text() == "abXf"
+
+
+def test_match_spanning_more_than_two_pieces():
+    table = split_table("a", "b", "c", "d")
+    assert table.find_all("abcd") == [0]
+    assert table.find_all("bc") == [1]
+
+
+def test_overlapping_occurrences_are_counted_left_to_right():
+    assert PieceTable("aaaa").find_all("aa") == [0, 2]
+    assert PieceTable("aaa").find_all("aa") == [0]
+    table = split_table("a", "a", "a", "a", "a")
+    assert table.find_all("aa") == [0, 2]
+    assert table.find_all("aaa") == [0]
+    table = split_table("aba", "bab")
+    assert table.find_all("abab") == [0]
+
+
+def test_empty_pattern_is_rejected():
+    with pytest.raises(EditError):
+        PieceTable("text").find_all("")
+
+
+def test_dense_edit_falls_back_to_str_replace():
+    table = PieceTable("x-" * MAX_PIECES)
+    assert table.replace_all("-", "+-") == MAX_PIECES
+    assert len(table._pieces) == 1
+    assert table.text() == "x+-" * MAX_PIECES
+    assert len(table) == len(table.text())
+
+
+def test_edits_match_chained_str_replace():
+    rng = random.Random(7)
+    for _ in range(300):
+        text = "".join(rng.choice("ab") for _ in range(rng.randrange(1, 40)))
+        table, expected = PieceTable(text), text
+        for _ in range(rng.randrange(1, 8)):
+            old = "".join(rng.choice("ab") for _ in range(rng.randrange(1, 4)))
+            new = "".join(rng.choice("abc") for _ in range(rng.randrange(0, 4)))
+            assert table.replace_all(old, new) == expected.count(old)
+            expected = expected.replace(old, new)
+            assert table.text() == expected and len(table) == len(expected)
+
+
+def test_batch_edits_see_earlier_results():
+    text, counts = apply_edits(
+        "one two two",
+        [
+            DocumentEdit(old_str="two", new_str="three", expected_matches=2),
+            DocumentEdit(old_str="three three", new_str="3"),
+        ],
+    )
+    assert (text, counts) == ("one 3", [2, 1])
+
+
+@pytest.mark.parametrize(
+    "failing",
+    [
+        DocumentEdit(old_str="missing", new_str="x"),
+        DocumentEdit(old_str="two", new_str="x", expected_matches=1),
+    ],
+)
+def test_failed_edit_fails_the_whole_batch(failing):
+    with pytest.raises(EditError):
+        apply_edits("one two two", [DocumentEdit(old_str="one", new_str="1"), failing])
@@ -0,0 +1,63 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from core.history import REPEATED_DOCUMENT, SUMMARY_ID, HistoryManager
+
+
+def turns(count: int) -> list:
+    messages = []
+    for n in range(count):
+        messages.append(HumanMessage(f"<query>question {n}</query>"))
+        messages.append(AIMessage(f"answer {n}"))
+    return messages
+
+
+def compact(manager: HistoryManager, messages: list) -> list:
+    return asyncio.run(manager.compact(messages))
+
+
+def test_old_turns_are_folded_into_a_summary():
+    manager = HistoryManager(window_turns=2, compact_every=2)
+    # Not yet past window + compact_every turns
+    assert compact(manager, turns(4)) == turns(4)
+
+    messages = compact(manager, turns(5))
+    summary, kept = messages[0], messages[1:]
+    assert isinstance(summary, SystemMessage) and summary.id == SUMMARY_ID
+    assert "question 0" in summary.content and "answer 2" in summary.content
+    assert kept == turns(5)[6:]
+
+
+def test_summary_is_carried_into_the_next_compaction():
+    manager = HistoryManager(window_turns=1, compact_every=1)
+    messages = compact(manager, turns(3))
+    messages = compact(manager, messages + turns(4)[6:] + turns(5)[8:])
+    assert "question 0" in messages[0].content and "question 3" in messages[0].content
+    assert [m.content for m in messages[1:]] == ["<query>question 4</query>", "answer 4"]
+
+
+def test_zero_window_still_keeps_the_current_query():
+    manager = HistoryManager(window_turns=0, compact_every=1)
+    history = turns(2) + [HumanMessage("<query>current</query>")]
+    messages = compact(manager, history)
+    assert messages[-1].content == "<query>current</query>"
+    assert "current" not in messages[0].content
+
+
+def test_repeated_document_bodies_are_kept_only_in_the_latest_mention():
+    doc = '<document id="plan.md">\nThe plan body.\n</document>'
+    other = '<document id="plan.md">\nAn edited plan body.\n</document>'
+    history = [
+        HumanMessage(f"first {doc}"),
+        AIMessage("ok"),
+        HumanMessage(f"second {other}"),
+        AIMessage("ok"),
+        HumanMessage(f"third {doc}"),
+    ]
+    messages = compact(HistoryManager(), history)
+    assert REPEATED_DOCUMENT in messages[0].content
+    assert "The plan body." not in messages[0].content
+    # A different body under the same id is a different document version
+    assert messages[2].content == history[2].content
+    assert messages[4].content == history[4].content
@@ -0,0 +1,62 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from conftest import SERVER, free_port
+from mcp_client import HTTPMCPClient
+
+
+@pytest.fixture(params=[("streamable-http", "/mcp"), ("sse", "/sse")])
+def server_url(request):
+    transport, path = request.param
+    port = free_port()
+    env = {
+        **os.environ,
+        "MCP_TRANSPORT": transport,
+        "MCP_HOST": "127.0.0.1",
+        "MCP_PORT": str(port),
+        "DOC_STORE": "memory",
+    }
+    process = subprocess.Popen([sys.executable, SERVER], env=env)
+    try:
+        deadline = time.monotonic() + 20
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline or process.poll() is not None:
+                    raise RuntimeError("server did not start")
+                time.sleep(0.1)
+        yield f"http://127.0.0.1:{port}{path}"
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def test_list_read_and_call_over_http(server_url):
+    async def run():
+        async with HTTPMCPClient(server_url) as client:
+            tools = {tool.name for tool in await client.list_tools()}
+            assert {"read_doc_contents", "edit_document"} <= tools
+            assert "plan.md" in await client.read_resource("docs://documents")
+
+            content = await client.read_resource("docs://documents/plan.md")
+            result = await client.call_tool("read_doc_contents", {"doc_id": "plan.md"})
+            assert result.content[0].text == content
+
+            await client.call_tool(
+                "edit_document",
+                {"doc_id": "plan.md", "old_str": "plan", "new_str": "PLAN"},
+            )
+            edited = await client.read_resource(
+                "docs://documents/plan.md", use_cache=False
+            )
+            assert "PLAN" in edited
+
+    asyncio.run(run())
@@ -0,0 +1,78 @@
+import asyncio
+import contextlib
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+from conftest import SERVER, free_port
+from mcp_client import MCPClient
+
+
+def list_ids(env: dict, wait_for=None) -> list[str]:
+    async def run():
+        async with MCPClient(sys.executable, [SERVER], env=env) as client:
+            announced = asyncio.Event()
+            uri = f"docs://documents/{wait_for}"
+            client.add_resource_listener(
+                lambda changes: changes and uri in changes.added and announced.set()
+            )
+            for _ in range(100):
+                ids = await client.read_resource("docs://documents", use_cache=False)
+                if wait_for is None or wait_for in ids:
+                    break
+                await asyncio.sleep(0.05)
+            if wait_for is not None:
+                # Let the ingestion announcement arrive rather than race the
+                # shutdown; it never comes if it went out before this session
+                # read anything
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(announced.wait(), 1)
+            return ids
+
+    return asyncio.run(run())
+
+
+def stored(db: str, doc_id: str) -> bool:
+    try:
+        with sqlite3.connect(f"file:{db}?mode=ro", uri=True) as conn:
+            query = "SELECT 1 FROM documents WHERE id = ?"
+            return conn.execute(query, (doc_id,)).fetchone() is not None
+    except sqlite3.OperationalError:
+        # Not created yet
+        return False
+
+
+def test_missing_source_dir_keeps_the_samples(tmp_path):
+    env = {**os.environ, "DOC_STORE": "memory", "DOC_SOURCE_DIR": str(tmp_path / "nope")}
+    assert "plan.md" in list_ids(env)
+
+
+def test_source_dir_is_ingested_instead_of_the_samples(tmp_path):
+    (tmp_path / "notes.md").write_text("# Notes")
+    env = {**os.environ, "DOC_STORE": "memory", "DOC_SOURCE_DIR": str(tmp_path)}
+    assert list_ids(env, wait_for="notes.md") == ["notes.md"]
+
+
+def test_http_server_ingests_before_any_session(tmp_path):
+    source = tmp_path / "source"
+    source.mkdir()
+    (source / "notes.md").write_text("# Notes")
+    db = str(tmp_path / "docs.db")
+    env = {
+        **os.environ,
+        "MCP_TRANSPORT": "streamable-http",
+        "MCP_PORT": str(free_port()),
+        "DOC_STORE": f"sqlite:///{db}",
+        "DOC_SOURCE_DIR": str(source),
+    }
+    process = subprocess.Popen([sys.executable, SERVER], env=env)
+    try:
+        deadline = time.monotonic() + 20
+        while not stored(db, "notes.md"):
+            assert time.monotonic() < deadline and process.poll() is None
+            time.sleep(0.1)
+    finally:
+        process.terminate()
+        process.wait(10)
@@ -0,0 +1,56 @@
+import io
+
+import pytest
+from rich.console import Console
+from rich.markdown import Markdown
+
+from core.markdown_stream import MarkdownStream
+
+CASES = {
+    "paragraphs": "# Title\n\nFirst paragraph.\n\nSecond paragraph.\n",
+    "loose list": "Steps:\n\n- one\n\n- two\n\n- three\n\nDone.\n",
+    "loose ordered list": "1. first\n\n2. second\n\n3. third\n",
+    "list continuation": (
+        "- item one\n\n  continues item one\n\n- item two\n\n"
+        "  more of two\n\nAfter the list.\n"
+    ),
+    "indented code": "Code:\n\n    line one\n\n    line three\n\nText after.\n",
+    "fenced code": "Before\n\n```python\nx = 1\n\ny = 2\n```\n\nAfter\n",
+    "longer fence around a shorter one": "````\n```\n\n```\n````\n\nafter\n",
+    "tilde fence around backticks": "~~~\n```\n\nstill code\n~~~\n\nafter\n",
+    "fence closed by a longer run": "```\ncode\n\n`````\n\nafter\n",
+    "fence line with trailing text": "```\n``` not a close\n\ncode\n```\n\nafter\n",
+    "rule and quote": "Intro\n\n---\n\n> quoted\n\n> again\n\nEnd\n",
+    "nested list": "- a\n\n  - b\n\n  - c\n\n- d\n",
+}
+
+
+def render(text: str) -> str:
+    console = Console(file=io.StringIO(), width=60, color_system=None)
+    console.print(Markdown(text))
+    return console.file.getvalue()
+
+
+def stream(text: str, chunk: int) -> str:
+    console = Console(file=io.StringIO(), width=60, color_system=None)
+    with MarkdownStream(console) as md:
+        for start in range(0, len(text), chunk):
+            md.feed(text[start : start + chunk])
+    return console.file.getvalue()
+
+
+@pytest.mark.parametrize("name", CASES)
+@pytest.mark.parametrize("chunk", [1, 7, 1000])
+def test_streamed_output_matches_single_render(name, chunk):
+    text = CASES[name]
+    assert stream(text, chunk) == render(text)
+
+
+def test_blocks_are_printed_once_the_next_block_starts():
+    console = Console(file=io.StringIO(), width=60, color_system=None)
+    md = MarkdownStream(console)
+    md.feed("- one\n\n- two\n\n")
+    assert console.file.getvalue() == ""
+    md.feed("Done.\n")
+    assert console.file.getvalue() == render("- one\n\n- two\n")
+    md.close()
@@ -0,0 +1,55 @@
+import asyncio
+import os
+import sys
+
+from conftest import SERVER
+from mcp_pool import MCPClientPool
+
+
+def make_pool(tmp_path, size=3):
+    env = {**os.environ, "DOC_STORE": f"sqlite:///{tmp_path / 'docs.db'}"}
+    return MCPClientPool(
+        sys.executable,
+        [SERVER],
+        env=env,
+        size=size,
+        resource_cache_bytes=1 << 20,
+        tool_cache_bytes=1 << 20,
+    )
+
+
+def test_workers_share_caches(tmp_path):
+    pool = make_pool(tmp_path)
+    assert all(w.resource_cache is pool.resource_cache for w in pool._workers)
+    assert all(w.tool_cache is pool.tool_cache for w in pool._workers)
+
+
+def test_edit_on_primary_is_seen_by_other_workers(tmp_path):
+    async def run():
+        async with make_pool(tmp_path) as pool:
+            uri = "docs://documents/plan.md"
+            secondary = pool._workers[1]
+            before = await secondary.read_resource(uri)
+            tool_before = await secondary.call_tool(
+                "read_doc_contents", {"doc_id": "plan.md"}
+            )
+            assert tool_before.content[0].text == before
+
+            await pool.primary.call_tool(
+                "edit_document",
+                {"doc_id": "plan.md", "old_str": "plan", "new_str": "PLAN"},
+            )
+            # resources/updated reaches the session asynchronously
+            for _ in range(50):
+                if uri not in pool.resource_cache:
+                    break
+                await asyncio.sleep(0.05)
+
+            after = await secondary.read_resource(uri)
+            tool_after = await secondary.call_tool(
+                "read_doc_contents", {"doc_id": "plan.md"}
+            )
+            assert "PLAN" in after and after != before
+            assert tool_after.content[0].text == after
+
+    asyncio.run(run())
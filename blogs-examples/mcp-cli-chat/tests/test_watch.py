@@ -0,0 +1,39 @@
+import asyncio
+import os
+import sys
+
+from conftest import SERVER
+from mcp_client import MCPClient
+
+
+def test_server_announces_changes_made_by_another_server(tmp_path):
+    env = {
+        **os.environ,
+        "DOC_STORE": f"sqlite:///{tmp_path / 'docs.db'}",
+        "DOC_WATCH_INTERVAL": "0.1",
+    }
+
+    async def run():
+        async with MCPClient(sys.executable, [SERVER], env=env) as editor:
+            async with MCPClient(
+                sys.executable, [SERVER], env=env, resource_cache_bytes=1 << 20
+            ) as reader:
+                changes = []
+                reader.add_resource_listener(changes.append)
+                uri = "docs://documents/plan.md"
+                await reader.read_resource(uri)
+                assert uri in reader.resource_cache
+
+                await editor.call_tool(
+                    "edit_document",
+                    {"doc_id": "plan.md", "old_str": "plan", "new_str": "PLAN"},
+                )
+                for _ in range(100):
+                    if uri not in reader.resource_cache:
+                        break
+                    await asyncio.sleep(0.05)
+                assert uri not in reader.resource_cache
+                assert "PLAN" in await reader.read_resource(uri)
+                assert [c.updated for c in changes if c is not None] == [[uri]]
+
+    asyncio.run(run())
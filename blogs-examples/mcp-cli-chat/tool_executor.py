@@ -0,0 +1,99 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+class ToolTimeoutError(TimeoutError):
+    pass
+
+
+class ToolExecutor:
+    """Runs tool handlers off the server's event loop.
+
+    Handlers wrapped with ``handler`` get their own concurrency limit and
+    timeout. Sync handlers run on a thread pool; async ones stay on the loop
+    and pass blocking calls to ``run_io`` and CPU-bound work to ``run_cpu``,
+    which uses a process pool, so it must be picklable and must not need the
+    server's state. A call over its timeout is answered with an error, but
+    work that already started finishes in the background and keeps its slot
+    until it does. Tools that write must therefore have no timeout, or a
+    caller could be told an edit failed that then goes through.
+    """
+
+    def __init__(
+        self,
+        thread_workers: Optional[int] = None,
+        process_workers: Optional[int] = None,
+    ):
+        self._threads = ThreadPoolExecutor(thread_workers, thread_name_prefix="tool")
+        self._process_workers = process_workers
+        # Started on first use; most sessions never need it
+        self._processes: Optional[ProcessPoolExecutor] = None
+
+    async def run_io(self, fn: Callable[..., Any], *args) -> Any:
+        # Thread pools don't carry context variables over by themselves, and
+        # FastMCP's request context is one
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self._threads, functools.partial(context.run, fn, *args)
+        )
+
+    async def run_cpu(self, fn: Callable[..., Any], *args) -> Any:
+        if self._processes is None:
+            # Not forked: a stdio server has a thread blocked reading stdin,
+            # and a forked worker deadlocks on that lock when it closes stdin
+            self._processes = ProcessPoolExecutor(
+                self._process_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return await asyncio.get_running_loop().run_in_executor(
+            self._processes, fn, *args
+        )
+
+    def handler(
+        self,
+        name: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ):
+        """Decorator for a tool handler; put it below ``@mcp.tool``. ``name``
+        is used in timeout errors and defaults to the function's name."""
+        slots = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+        def decorator(fn):
+            tool = name or fn.__name__
+
+            # functools.wraps keeps the signature FastMCP builds the schema from
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                if slots is not None:
+                    await slots.acquire()
+                if inspect.iscoroutinefunction(fn):
+                    work = asyncio.ensure_future(fn(*args, **kwargs))
+                else:
+                    work = asyncio.ensure_future(
+                        self.run_io(functools.partial(fn, *args, **kwargs))
+                    )
+                work.add_done_callback(functools.partial(_finished, slots))
+                try:
+                    return await asyncio.wait_for(asyncio.shield(work), timeout)
+                except asyncio.TimeoutError:
+                    raise ToolTimeoutError(
+                        f"Tool '{tool}' timed out after {timeout}s"
+                    ) from None
+
+            return wrapper
+
+        return decorator
+
+
+def _finished(slots: Optional[asyncio.Semaphore], work: asyncio.Future):
+    if slots is not None:
+        slots.release()
+    # Retrieve the outcome of work that outlived its timeout, so asyncio
+    # doesn't report its exception as never retrieved
+    if not work.cancelled():
+        work.exception()